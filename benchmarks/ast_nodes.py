@@ -0,0 +1,36 @@
+"""
+Memory usage and construction time of AST for large parsed queries.
+"""
+from __future__ import print_function
+
+import time
+import tracemalloc
+
+from utils import setup_django
+
+setup_django()
+
+from djangoql.parser import DjangoQLParser  # noqa: E402
+
+
+def parsed(parser, query):
+    tracemalloc.start()
+    start = time.time()
+    ast = parser.parse(query)
+    elapsed = time.time() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ast, elapsed, size
+
+
+if __name__ == '__main__':
+    parser = DjangoQLParser(engine='descent')
+    for terms in (1000, 10000):
+        query = ' or '.join(
+            '(author.groups.name = "group %s" and rating in (%s, 2, 3))' %
+            (i, i) for i in range(terms // 2)
+        )
+        parser.parse(query)  # warm up
+        ast, elapsed, size = parsed(parser, query)
+        print('%6s terms: parsed in %6.1fms, AST takes %6.1f KiB' % (
+            terms, elapsed * 1000, size / 1024.0))
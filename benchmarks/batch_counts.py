@@ -0,0 +1,69 @@
+"""
+Numbers of matching objects for 100 saved queries: a count() query per
+search vs. count_searches(), which computes all of them in a single query.
+"""
+from __future__ import print_function
+
+from utils import measure, report, setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from djangoql.queryset import apply_search, count_searches  # noqa: E402
+
+from core.models import Book  # noqa: E402
+
+
+SEARCHES = [
+    'name ~ "%s"' % i if i % 4 == 0 else
+    'rating > %s and price < %s' % (i % 5, i) if i % 4 == 1 else
+    'author.username = "user%s"' % i if i % 4 == 2 else
+    'author.groups.name in ("group %s", "group %s")' % (i % 7, i % 11)
+    for i in range(100)
+]
+
+
+def create_data(users=200, books=20000):
+    groups = [Group.objects.create(name='group %s' % i) for i in range(20)]
+    users = [User.objects.create(username='user%s' % i) for i in range(users)]
+    for i, user in enumerate(users):
+        user.groups.add(*groups[i % 7:i % 7 + 3])
+    Book.objects.bulk_create([
+        Book(
+            name='book%s' % i,
+            author=users[i % len(users)],
+            rating=i % 5,
+            price=i % 100,
+        )
+        for i in range(books)
+    ])
+
+
+def separate_counts():
+    return [
+        apply_search(Book.objects.all(), search).distinct().count()
+        for search in SEARCHES
+    ]
+
+
+def batch_counts():
+    return count_searches(Book.objects.all(), SEARCHES)
+
+
+if __name__ == '__main__':
+    with test_database() as connection:
+        create_data()
+        assert separate_counts() == batch_counts()
+        baseline = None
+        for title, func in (
+            ('count() per search', separate_counts),
+            ('count_searches()', batch_counts),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                func()
+            seconds = measure(func, 5)
+            report('%s, %s queries' % (title, len(queries)), seconds,
+                   baseline)
+            baseline = baseline or seconds
@@ -0,0 +1,42 @@
+"""
+Validation and filter building for long lists of dates and timestamps.
+"""
+from __future__ import print_function
+
+from datetime import date, timedelta
+
+from utils import measure, report, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from djangoql.queryset import compile_search  # noqa: E402
+from djangoql.schema import DjangoQLSchema  # noqa: E402
+
+from core.models import Book  # noqa: E402
+
+
+class NoCacheSchema(DjangoQLSchema):
+    cache_queries = False
+
+
+def search(model, query):
+    def func():
+        ast, q = compile_search(query, model, NoCacheSchema)
+        str(model.objects.filter(q).query)
+    return func
+
+
+if __name__ == '__main__':
+    start = date(2000, 1, 1)
+    for size in (100, 1000, 5000):
+        days = [start + timedelta(days=i) for i in range(size)]
+        dates = ', '.join('"%s"' % d for d in days)
+        timestamps = ', '.join('"%s 12:30"' % d for d in days)
+        report('%s dates' % size, measure(
+            search(User, 'last_login in (%s)' % dates), 5,
+        ))
+        report('%s timestamps' % size, measure(
+            search(Book, 'written in (%s)' % timestamps), 5,
+        ))
@@ -0,0 +1,77 @@
+"""
+Throughput of compiled predicates over a million dicts, compared with
+hand-written conditions.
+"""
+from __future__ import print_function
+
+import random
+
+from utils import measure, report, setup_django
+
+setup_django()
+
+from djangoql.evaluator import compile_predicate  # noqa: E402
+
+
+random.seed(0)
+RECORDS = [
+    {
+        'id': i,
+        'type': random.choice(['click', 'view', 'purchase', None]),
+        'value': random.choice([None, random.random() * 100]),
+        'user': {
+            'name': 'user%s' % random.randint(0, 1000),
+            'groups': [{'name': 'group%s' % j} for j in range(i % 3)],
+        },
+    }
+    for i in range(1000000)
+]
+
+CASES = [
+    (
+        'type = "click"',
+        lambda r: r.get('type') == 'click',
+    ),
+    (
+        'type in ("click", "view") and value > 50',
+        lambda r: r.get('type') in ('click', 'view') and
+        r.get('value') is not None and r.get('value') > 50,
+    ),
+    (
+        'type ~ "LICK" or value = None',
+        lambda r: (r.get('type') is not None and
+                   'lick' in r.get('type').lower()) or
+        r.get('value') is None,
+    ),
+    (
+        'user.name = "user7"',
+        lambda r: (r.get('user') or {}).get('name') == 'user7',
+    ),
+    (
+        'user.groups.name = "group1"',
+        lambda r: any(
+            g.get('name') == 'group1'
+            for g in (r.get('user') or {}).get('groups') or []
+        ),
+    ),
+]
+
+
+def run(predicate):
+    count = 0
+    for record in RECORDS:
+        if predicate(record):
+            count += 1
+    return count
+
+
+if __name__ == '__main__':
+    for search, handwritten in CASES:
+        predicate = compile_predicate(search)
+        assert run(predicate) == run(handwritten), search
+        print(search)
+        baseline = measure(lambda: run(handwritten), 3) / len(RECORDS)
+        report('  hand-written', baseline)
+        seconds = measure(lambda: run(predicate), 3) / len(RECORDS)
+        report('  compiled, %.1fM records/s' % (1e-6 / seconds), seconds,
+               baseline)
@@ -0,0 +1,70 @@
+"""
+Export of search results: loading model instances vs. streaming export of
+selected columns. Prints time and peak memory allocated by Python.
+"""
+from __future__ import print_function
+
+import csv
+import tracemalloc
+
+from utils import measure, report, setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from djangoql.queryset import apply_search  # noqa: E402
+from djangoql.streaming import Echo, export_lines  # noqa: E402
+
+from core.models import Book  # noqa: E402
+
+
+SEARCH = 'name ~ "1" and author.username != "nobody"'
+COLUMNS = ['id', 'name', 'rating', 'author.username']
+
+
+def create_data(books=50000):
+    author = User.objects.create(username='author')
+    Book.objects.bulk_create([
+        Book(name='book%s' % i, author=author, rating=i % 5)
+        for i in range(books)
+    ])
+
+
+def load_instances():
+    writer = csv.writer(Echo())
+    qs = Book.objects.select_related('author')
+    for book in apply_search(qs, SEARCH):
+        writer.writerow([
+            book.id,
+            book.name,
+            book.rating,
+            book.author.username,
+        ])
+
+
+def stream():
+    for _ in export_lines(Book.objects.all(), SEARCH, COLUMNS):
+        pass
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == '__main__':
+    with test_database():
+        create_data()
+        baseline = None
+        for title, func in (
+            ('Load instances', load_instances),
+            ('Streaming export', stream),
+        ):
+            seconds = measure(func, 3)
+            report(title, seconds, baseline)
+            baseline = baseline or seconds
+            print('  peak memory: %.1f MB' % (peak_memory(func) / 1e6))
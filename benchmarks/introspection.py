@@ -0,0 +1,67 @@
+"""
+Schema introspection: full walk of related models vs. lazy resolution of a
+single name or a single model, with and without shared introspection cache.
+"""
+from __future__ import print_function
+
+from utils import measure, report, setup_django
+
+setup_django()
+
+from djangoql.ast import Name  # noqa: E402
+from djangoql.exceptions import DjangoQLSchemaError  # noqa: E402
+from djangoql.schema import DjangoQLSchema  # noqa: E402
+
+from core.models import Book  # noqa: E402
+
+
+class NoCacheSchema(DjangoQLSchema):
+    cache_introspection = False
+
+
+def introspect(schema):
+    return lambda: len(schema(Book).models)
+
+
+def as_dict(schema):
+    return lambda: schema(Book).as_dict()
+
+
+def model_as_dict(schema):
+    return lambda: schema(Book).model_as_dict()
+
+
+def resolve(schema, parts=('author', 'email')):
+    name = Name(list(parts))
+    return lambda: schema(Book).resolve_name(name)
+
+
+def resolve_unknown(schema):
+    resolve_name = resolve(schema, ('author', 'emial'))
+
+    def func():
+        try:
+            resolve_name()
+        except DjangoQLSchemaError:
+            pass
+    return func
+
+
+if __name__ == '__main__':
+    baseline = measure(introspect(NoCacheSchema), 200)
+    report('Introspection', baseline)
+    report('Resolve name', measure(resolve(NoCacheSchema), 200), baseline)
+    report('Cached introspection', measure(introspect(DjangoQLSchema), 200),
+           baseline)
+    baseline = measure(as_dict(NoCacheSchema), 200)
+    report('Introspection payload, all models', baseline)
+    report('Introspection payload, current model',
+           measure(model_as_dict(NoCacheSchema), 200), baseline)
+    deep = ('author', 'groups', 'permissions', 'content_type', 'model')
+    for title, func in (
+        ('Resolve name, cached schema', resolve(DjangoQLSchema)),
+        ('Resolve long name, cached schema', resolve(DjangoQLSchema, deep)),
+        ('Resolve unknown name, cached schema',
+         resolve_unknown(DjangoQLSchema)),
+    ):
+        report(title, measure(func, 2000))
@@ -0,0 +1,32 @@
+"""
+Tokenizing speed of PLY-based DjangoQLLexer vs. DjangoQLFastLexer.
+"""
+from __future__ import print_function
+
+from utils import measure, report, setup_django
+
+setup_django()
+
+from djangoql.lexer import DjangoQLFastLexer, DjangoQLLexer  # noqa: E402
+
+
+QUERIES = {
+    'short': 'name ~ "war" and author.last_name = "Tolstoy"',
+    '1000 terms': ' or '.join(
+        '(id = %s and name != "book %s")' % (i, i) for i in range(500)
+    ),
+}
+
+
+if __name__ == '__main__':
+    ply = DjangoQLLexer()
+    fast = DjangoQLFastLexer()
+    for title, query in sorted(QUERIES.items()):
+        number = 2000 if title == 'short' else 20
+        baseline = measure(lambda: list(ply.input(query)), number)
+        report('%s, ply lexer' % title, baseline)
+        report(
+            '%s, fast lexer' % title,
+            measure(lambda: list(fast.input(query)), number),
+            baseline,
+        )
@@ -0,0 +1,38 @@
+"""
+Time to parse, validate, build and compile queries with long chains of
+logical operators, should grow linearly with the number of terms.
+"""
+from __future__ import print_function
+
+import time
+
+from utils import setup_django
+
+setup_django()
+
+from core.models import Book  # noqa: E402
+
+from djangoql.parser import get_parser  # noqa: E402
+from djangoql.queryset import build_filter  # noqa: E402
+from djangoql.schema import DjangoQLSchema  # noqa: E402
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, (time.time() - start) * 1000
+
+
+if __name__ == '__main__':
+    print('%8s %10s %10s %10s %10s' % (
+        'terms', 'parse', 'validate', 'build', 'compile'))
+    for terms in (1000, 2000, 5000, 10000):
+        query = ' or '.join('id = %s' % i for i in range(terms))
+        ast, parse = timed(get_parser().parse, query)
+        schema = DjangoQLSchema(Book)
+        schema.validate(ast)  # warm up schema introspection
+        _, validate = timed(schema.validate, ast)
+        q, build = timed(build_filter, ast, schema)
+        _, compile_ = timed(lambda: str(Book.objects.filter(q).query))
+        print('%8s %8.1fms %8.1fms %8.1fms %8.1fms' % (
+            terms, parse, validate, build, compile_))
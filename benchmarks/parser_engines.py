@@ -0,0 +1,34 @@
+"""
+Parsing speed of PLY and recursive descent parser engines on long queries.
+"""
+from __future__ import print_function
+
+from utils import measure, report, setup_django
+
+setup_django()
+
+from djangoql.parser import DjangoQLParser  # noqa: E402
+
+
+QUERIES = {
+    'short': 'name ~ "war" and author.last_name = "Tolstoy"',
+    '100 terms': ' or '.join(
+        '(id = %s and name ~ "book %s")' % (i, i) for i in range(50)
+    ),
+    '1000 terms': ' or '.join('id = %s' % i for i in range(1000)),
+    'IN list of 5000': 'id in (%s)' % ', '.join(str(i) for i in range(5000)),
+}
+
+
+if __name__ == '__main__':
+    ply = DjangoQLParser(engine='ply')
+    descent = DjangoQLParser(engine='descent')
+    for title, query in sorted(QUERIES.items()):
+        number = 2000 if title == 'short' else 20
+        baseline = measure(lambda: ply.parse(query), number)
+        report('%s, ply' % title, baseline)
+        report(
+            '%s, descent' % title,
+            measure(lambda: descent.parse(query), number),
+            baseline,
+        )
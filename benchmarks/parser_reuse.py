@@ -0,0 +1,54 @@
+"""
+Per-search overhead of building a new DjangoQLParser vs. reusing the shared
+per-thread parser, measured from several threads like in a threaded WSGI
+server.
+"""
+from __future__ import print_function
+
+import threading
+import time
+
+from utils import report, setup_django
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from djangoql.parser import DjangoQLParser, get_parser  # noqa: E402
+from djangoql.queryset import build_filter  # noqa: E402
+from djangoql.schema import DjangoQLSchema  # noqa: E402
+
+
+QUERY = 'username ~ "john" and (groups.name = "Staff" or is_active = True)'
+THREADS = 8
+SEARCHES_PER_THREAD = 200
+
+
+def search(parser_factory):
+    ast = parser_factory().parse(QUERY)
+    schema_instance = DjangoQLSchema(User)
+    schema_instance.validate(ast)
+    return User.objects.filter(build_filter(ast, schema_instance))
+
+
+def run_threads(parser_factory):
+    def worker():
+        for _ in range(SEARCHES_PER_THREAD):
+            search(parser_factory)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.time() - start) / (THREADS * SEARCHES_PER_THREAD)
+
+
+if __name__ == '__main__':
+    # warm up: imports, parse tables, schema introspection code paths
+    search(DjangoQLParser)
+    print('%s threads x %s searches' % (THREADS, SEARCHES_PER_THREAD))
+    new_parser = run_threads(DjangoQLParser)
+    report('new parser per search', new_parser)
+    report('shared per-thread parser', run_threads(get_parser), new_parser)
@@ -0,0 +1,75 @@
+"""
+Negated conditions on multi-valued relations: default lookups vs.
+relation_subqueries schema option. Prints time per query, number of queries
+and SQLite query plans.
+"""
+from __future__ import print_function
+
+from utils import measure, report, setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import Group, User  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from djangoql.queryset import apply_search  # noqa: E402
+from djangoql.schema import DjangoQLSchema  # noqa: E402
+
+from core.models import Book  # noqa: E402
+
+
+class SubquerySchema(DjangoQLSchema):
+    relation_subqueries = True
+
+
+SEARCHES = (
+    (User, 'groups.name != "group 3"'),
+    (User, 'book.name !~ "7" and book.rating not in (1, 2)'),
+    (Book, 'author.groups.name not in ("group 1", "group 2")'),
+    (Book, 'author.book.rating != None'),
+)
+
+
+def create_data(users=1000, groups=20, books=5):
+    groups = [
+        Group.objects.create(name='group %s' % i) for i in range(groups)
+    ]
+    for i in range(users):
+        user = User.objects.create(username='user%s' % i)
+        user.groups.add(*groups[i % 7:i % 7 + i % 3])
+        Book.objects.bulk_create([
+            Book(
+                name='book%s' % j,
+                author=user,
+                rating=j % 4 or None,
+            ) for j in range(i % books)
+        ])
+
+
+def query_plan(connection, qs):
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+if __name__ == '__main__':
+    with test_database() as connection:
+        create_data()
+        for model, search in SEARCHES:
+            print('%s: %s' % (model.__name__, search))
+            baseline = None
+            for schema in (DjangoQLSchema, SubquerySchema):
+                qs = apply_search(model.objects.all(), search, schema)
+                with CaptureQueriesContext(connection) as queries:
+                    list(qs)
+                seconds = measure(lambda: list(qs.all()), 20)
+                report(
+                    '  %s, %s queries' % (schema.__name__, len(queries)),
+                    seconds,
+                    baseline,
+                )
+                baseline = baseline or seconds
+                for line in query_plan(connection, qs):
+                    print('    %s' % line)
+            print()
@@ -0,0 +1,63 @@
+"""
+Helpers shared by benchmark scripts.
+
+Benchmarks are plain scripts that use test_project settings, run them from
+the repository root, for example:
+
+    $ python benchmarks/parser_reuse.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    for path in (ROOT, os.path.join(ROOT, 'test_project')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_project.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """
+    Creates test database for benchmarks which need to run queries
+    """
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, number):
+    """
+    Returns average time in seconds it took to call func
+    """
+    start = time.time()
+    for _ in range(number):
+        func()
+    return (time.time() - start) / number
+
+
+def report(title, seconds, baseline=None):
+    line = '%-45s %10.1f us' % (title, seconds * 1e6)
+    if baseline:
+        line += '  (x%.1f)' % (baseline / seconds)
+    print(line)
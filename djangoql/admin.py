@@ -1,20 +1,49 @@
+import hashlib
 import json
 
+from django.conf import settings
 from django.conf.urls import url
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import FieldError, ValidationError
+from django.core.exceptions import (
+    FieldError,
+    ImproperlyConfigured,
+    ValidationError,
+)
 from django.db.models import Q
-from django.http import HttpResponse
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
+from django.templatetags.static import static
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import urlencode
+from django.utils.text import compress_string
 from django.views.generic import TemplateView
 
+from .cache import LRUCache
 from .models import Query
 from .forms import QueryUpdateForm
 from .compat import text_type
+from .counting import (
+    CountingPaginator,
+    cached_count,
+    capped_count,
+    exact_count,
+)
 from .exceptions import DjangoQLError
-from .queryset import apply_search
+from .export import static_introspection_url
+from .queryset import apply_search, count_searches
 from .schema import DjangoQLSchema
+from .streaming import export_lines, formats
+
+
+# Serialized introspections, see DjangoQLSearchMixin.get_introspection()
+introspection_responses = LRUCache(
+    maxsize=getattr(settings, 'DJANGOQL_INTROSPECTION_CACHE_SIZE', 256),
+)
 
 
 class DjangoQLSearchMixin(object):
@@ -23,6 +52,33 @@ class DjangoQLSearchMixin(object):
     djangoql_query_manager = True
     djangoql_schema = DjangoQLSchema
     djangoql_syntax_help_template = 'djangoql/syntax_help.html'
+    # Compress introspection responses for clients which accept gzip
+    djangoql_introspect_gzip = True
+    # Cache-Control max-age of introspection responses, in seconds. Browsers
+    # revalidate them with ETag when it expires.
+    djangoql_introspect_max_age = 0
+    # Number of suggestion options per page
+    djangoql_suggestions_limit = 50
+    # Load introspections for completion from static files exported by
+    # djangoql_export_schema command, if they exist
+    djangoql_introspect_static = False
+    # Columns exported by export_csv and export_jsonl actions, like
+    # ['name', 'author.email']. All fields of the model by default.
+    djangoql_export_columns = None
+    # Number of objects fetched from the database at once during export
+    djangoql_export_chunk_size = 1000
+    # Show numbers of matching objects for saved queries. All of them are
+    # counted in a single database query.
+    djangoql_query_counts = False
+    # How changelist counts objects: 'exact', 'cached' (exact counts cached
+    # for djangoql_count_cache_timeout seconds), or 'capped' (up to
+    # djangoql_count_cap objects, displayed like "10000+")
+    djangoql_count_strategy = 'exact'
+    # Exact counts which take longer than that many seconds are capped.
+    # Supported on PostgreSQL and SQLite.
+    djangoql_count_timeout = None
+    djangoql_count_cache_timeout = 60
+    djangoql_count_cap = 10000
 
     def get_search_results(self, request, queryset, search_term):
         use_distinct = False
@@ -41,14 +97,68 @@ class DjangoQLSearchMixin(object):
         messages.add_message(request, messages.WARNING, msg)
         return queryset, use_distinct
 
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        if self.djangoql_count_strategy not in ('exact', 'cached', 'capped'):
+            raise ImproperlyConfigured(
+                'djangoql_count_strategy must be "exact", "cached" or '
+                '"capped", not %s' % repr(self.djangoql_count_strategy)
+            )
+        if self.djangoql_count_strategy == 'exact' and \
+                self.djangoql_count_timeout is None:
+            return super(DjangoQLSearchMixin, self).get_paginator(
+                request,
+                queryset,
+                per_page,
+                orphans,
+                allow_empty_first_page,
+            )
+        return CountingPaginator(
+            queryset,
+            per_page,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            count=self.get_djangoql_count,
+        )
+
+    def get_djangoql_count(self, queryset):
+        """
+        Returns the number of objects in changelist, see
+        djangoql_count_strategy
+        """
+        if self.djangoql_count_strategy == 'capped':
+            return capped_count(queryset, self.djangoql_count_cap)
+
+        def count(qs):
+            return exact_count(
+                qs,
+                timeout=self.djangoql_count_timeout,
+                cap=self.djangoql_count_cap,
+            )
+        if self.djangoql_count_strategy == 'cached':
+            return cached_count(
+                queryset,
+                self.djangoql_count_cache_timeout,
+                count=count,
+            )
+        return count(queryset)
+
     @property
     def media(self):
         media = super(DjangoQLSearchMixin, self).media
         if self.djangoql_completion:
+            completion_admin = 'djangoql/js/completion_admin.js'
+            static_url = self.get_static_introspection_url()
+            if static_url:
+                # completion_admin.js reads options from its query string
+                completion_admin = '%s?%s' % (
+                    static(completion_admin),
+                    urlencode({'introspections': static_url}),
+                )
             media.add_js((
                 'djangoql/js/lib/lexer.js',
                 'djangoql/js/completion.js',
-                'djangoql/js/completion_admin.js',
+                completion_admin,
             ))
             media.add_css({'': (
                 'djangoql/css/completion.css',
@@ -76,6 +186,22 @@ class DjangoQLSearchMixin(object):
                         self.model._meta.model_name,
                     ),
                 ),
+                url(
+                    r'^introspect-model/$',
+                    self.admin_site.admin_view(self.introspect_model),
+                    name='%s_%s_djangoql_introspect_model' % (
+                        self.model._meta.app_label,
+                        self.model._meta.model_name,
+                    ),
+                ),
+                url(
+                    r'^suggestions/$',
+                    self.admin_site.admin_view(self.suggestions),
+                    name='%s_%s_djangoql_suggestions' % (
+                        self.model._meta.app_label,
+                        self.model._meta.model_name,
+                    ),
+                ),
                 url(
                     r'^djangoql-syntax/$',
                     TemplateView.as_view(
@@ -123,14 +249,140 @@ class DjangoQLSearchMixin(object):
 
     def json_response(self, response, **kwargs):
         return HttpResponse(
-            content=json.dumps(response, indent=2),
+            content=json.dumps(response, separators=(',', ':')),
             content_type='application/json; charset=utf-8',
             **kwargs
         )
 
+    def get_static_introspection_url(self):
+        """
+        Returns URL of exported introspection, or None if static
+        introspections are disabled or weren't exported
+        """
+        if not self.djangoql_introspect_static:
+            return None
+        return static_introspection_url(self.djangoql_schema, self.model)
+
+    def get_introspection(self, label=None):
+        """
+        Returns (content, etag, gzipped content) tuple for introspection
+        response, of all models or of a single model with given label.
+
+        Responses are memoized, unless schema has introspection cache
+        disabled. The ETag is a fingerprint of the content.
+        """
+        schema = self.djangoql_schema(self.model)
+        key = None
+        if schema.cache_introspection:
+            key = (schema.introspection_key(), label)
+            cached = introspection_responses.get(key)
+            # cached introspection is replaced when models change
+            if cached is not None and cached[0] is schema.models:
+                return cached[1:]
+        if label is None:
+            introspection = schema.as_dict()
+        else:
+            introspection = schema.model_as_dict(label)
+        content = json.dumps(
+            introspection,
+            separators=(',', ':'),
+        ).encode('utf-8')
+        introspection = (
+            content,
+            '"%s"' % hashlib.md5(content).hexdigest(),
+            compress_string(content),
+        )
+        if key is not None:
+            introspection_responses.set(key, (schema.models,) + introspection)
+        return introspection
+
     def introspect(self, request):
-        response = self.djangoql_schema(self.model).as_dict()
-        return self.json_response(response)
+        return self.introspection_response(request, self.get_introspection())
+
+    def introspect_model(self, request):
+        """
+        Returns introspection of a single model, which label is passed in
+        query string, or of the current model. Completion widget loads
+        related models with it as user types their names.
+        """
+        try:
+            introspection = self.get_introspection(
+                request.GET.get('model') or
+                self.djangoql_schema.model_label(self.model),
+            )
+        except KeyError:
+            return self.json_response(
+                {'error': 'Unknown model: %s' % request.GET.get('model')},
+                status=400,
+            )
+        return self.introspection_response(request, introspection)
+
+    def introspection_response(self, request, introspection):
+        content, etag, gzipped = introspection
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        use_gzip = self.djangoql_introspect_gzip and \
+            'gzip' in accept_encoding and len(gzipped) < len(content)
+        if use_gzip:
+            # compressed representation needs its own strong ETag
+            etag = '%s-gzip"' % etag[:-1]
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in [
+            tag.strip().replace('W/', '', 1)
+            for tag in if_none_match.split(',')
+        ] or if_none_match.strip() == '*':
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                content=gzipped if use_gzip else content,
+                content_type='application/json; charset=utf-8',
+            )
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+            response['Content-Length'] = str(len(response.content))
+        response['ETag'] = etag
+        if self.djangoql_introspect_gzip:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        patch_cache_control(
+            response,
+            private=True,
+            max_age=self.djangoql_introspect_max_age,
+        )
+        return response
+
+    def suggestions(self, request):
+        """
+        Returns a page of suggestion options for a field, which start with
+        given search string. Expects model label, field name, search string
+        and page number in query string.
+        """
+        schema = self.djangoql_schema(self.model)
+        try:
+            field = schema.models[request.GET.get('model', '')][
+                request.GET.get('field', '')
+            ]
+        except KeyError:
+            field = None
+        if field is None or not field.suggest_options:
+            return self.json_response(
+                {'error': 'Options are not available for this field'},
+                status=400,
+            )
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
+        limit = self.djangoql_suggestions_limit
+        offset = (page - 1) * limit
+        options = field.get_cached_options(
+            request.GET.get('search', ''),
+            offset,
+            limit + 1,
+        )
+        return self.json_response({
+            'page': page,
+            'items': options[:limit],
+            'has_next': len(options) > limit,
+        })
 
     def get_current_content_type(self):
         return ContentType.objects.get(
@@ -156,6 +408,16 @@ class DjangoQLSearchMixin(object):
                 'public': list(public_queries)
             }
         }
+        if self.djangoql_query_counts:
+            queries = response['results']['user'] + \
+                response['results']['public']
+            counts = count_searches(
+                self.get_queryset(request),
+                [query['text'] for query in queries],
+                schema=self.djangoql_schema,
+            )
+            for query, count in zip(queries, counts):
+                query['count'] = count
         return self.json_response(response)
 
     def save_query(self, request):
@@ -189,3 +451,43 @@ class DjangoQLSearchMixin(object):
 
         return self.json_response({'success': False}, status=400)
 
+
+def export_response(modeladmin, request, queryset, format):
+    """
+    Streams selected objects in given export format, see
+    djangoql.streaming.formats
+    """
+    _, content_type, extension = formats[format]
+    # exported values are selected from admin queryset, so that annotations
+    # could be exported, and joins made by search don't duplicate rows
+    lines = export_lines(
+        modeladmin.get_queryset(request).filter(
+            pk__in=queryset.values('pk'),
+        ),
+        columns=modeladmin.djangoql_export_columns,
+        format=format,
+        schema=modeladmin.djangoql_schema,
+        chunk_size=modeladmin.djangoql_export_chunk_size,
+    )
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (
+        queryset.model._meta.model_name,
+        extension,
+    )
+    return response
+
+
+def export_csv(modeladmin, request, queryset):
+    return export_response(modeladmin, request, queryset, 'csv')
+
+
+export_csv.short_description = 'Export selected %(verbose_name_plural)s ' \
+                               'to CSV'
+
+
+def export_jsonl(modeladmin, request, queryset):
+    return export_response(modeladmin, request, queryset, 'jsonl')
+
+
+export_jsonl.short_description = 'Export selected %(verbose_name_plural)s ' \
+                                 'to JSON Lines'
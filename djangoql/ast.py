@@ -1,12 +1,36 @@
 from __future__ import unicode_literals
 
-from .compat import text_type
+from .compat import intern_string, text_type
+
+
+_set = object.__setattr__
 
 
 class Node(object):
+    """
+    Base class for AST nodes.
+
+    Nodes are immutable and hashable: they keep their state in slots listed in
+    .fields, and compute a structural hash once on creation from the hashes
+    of their children, so that large trees can be used as dict keys and
+    compared cheaply.
+    """
+    __slots__ = ('_hash',)
+    fields = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % self.__class__.__name__)
+
+    def __reduce__(self):
+        return self.__class__, tuple(getattr(self, k) for k in self.fields)
+
     def __str__(self):
         children = []
-        for k, v in self.__dict__.items():
+        for k in self.fields:
+            v = getattr(self, k)
             if isinstance(v, (list, tuple)):
                 v = '[%s]' % ', '.join([text_type(v) for v in v if v])
             children.append('%s=%s' % (k, v))
@@ -18,11 +42,28 @@ class Node(object):
 
     __repr__ = __str__
 
+    def __hash__(self):
+        return self._hash
+
     def __eq__(self, other):
-        if not isinstance(other, self.__class__):
-            return False
-        for k, v in self.__dict__.items():
-            if getattr(other, k) != v:
+        # Compare with explicit stack, trees may be deeper than recursion
+        # limit. Values are compared with ==, so Const(1) == Const(1.0).
+        stack = [(self, other)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            if isinstance(a, Node):
+                if type(a) is not type(b) or a._hash != b._hash:
+                    return False
+                stack.extend(
+                    (getattr(a, k), getattr(b, k)) for k in a.fields
+                )
+            elif isinstance(a, tuple):
+                if not isinstance(b, tuple) or len(a) != len(b):
+                    return False
+                stack.extend(zip(a, b))
+            elif a != b:
                 return False
         return True
 
@@ -31,20 +72,26 @@ class Node(object):
 
 
 class Expression(Node):
+    __slots__ = ('left', 'operator', 'right')
+    fields = __slots__
+
     def __init__(self, left, operator, right):
-        self.left = left
-        self.operator = operator
-        self.right = right
+        _set(self, 'left', left)
+        _set(self, 'operator', operator)
+        _set(self, 'right', right)
+        _set(self, '_hash', hash((left._hash, operator._hash, right._hash)))
 
 
 class Name(Node):
+    __slots__ = ('parts',)
+    fields = __slots__
+
     def __init__(self, parts):
-        if isinstance(parts, list):
-            self.parts = parts
-        elif isinstance(parts, tuple):
-            self.parts = list(parts)
-        else:
-            self.parts = [parts]
+        if not isinstance(parts, (list, tuple)):
+            parts = [parts]
+        parts = tuple([intern_string(p) for p in parts])
+        _set(self, 'parts', parts)
+        _set(self, '_hash', hash(('Name', parts)))
 
     @property
     def value(self):
@@ -52,13 +99,26 @@ class Name(Node):
 
 
 class Const(Node):
+    __slots__ = ('value',)
+    fields = __slots__
+
     def __init__(self, value):
-        self.value = value
+        _set(self, 'value', value)
+        try:
+            h = hash(('Const', value))
+        except TypeError:
+            h = hash(('Const', repr(value)))
+        _set(self, '_hash', h)
 
 
 class List(Node):
+    __slots__ = ('items',)
+    fields = __slots__
+
     def __init__(self, items):
-        self.items = items
+        items = tuple(items)
+        _set(self, 'items', items)
+        _set(self, '_hash', hash(('List', items)))
 
     @property
     def value(self):
@@ -66,13 +126,38 @@ class List(Node):
 
 
 class Operator(Node):
+    __slots__ = ('operator',)
+    fields = __slots__
+
     def __init__(self, operator):
-        self.operator = operator
+        _set(self, 'operator', operator)
+        _set(self, '_hash', hash((self.__class__.__name__, operator)))
 
 
 class Logical(Operator):
-    pass
+    __slots__ = ()
 
 
 class Comparison(Operator):
-    pass
+    __slots__ = ()
+
+
+def flatten(expression):
+    """
+    Returns operands of a chain of logical expressions with the same operator,
+    like [a, b, c] for "a or (b or c)". Operands are returned in their
+    original order. Works without recursion, so long chains can't hit
+    recursion limit.
+    """
+    operator = expression.operator.operator
+    operands = []
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        if isinstance(node.operator, Logical) and \
+                node.operator.operator == operator:
+            stack.append(node.right)
+            stack.append(node.left)
+        else:
+            operands.append(node)
+    return operands
@@ -4,7 +4,32 @@ PY2 = sys.version_info.major == 2
 
 if PY2:
     binary_type = str
+    string_types = basestring
     text_type = unicode
+
+    def intern_string(s):
+        # Python 2 can intern byte strings only
+        return intern(s) if isinstance(s, str) else s
+
+    def get_function(method):
+        # unbound methods of Python 2 are different objects on each access
+        return method.__func__
 else:
     binary_type = bytes
+    string_types = str
     text_type = str
+    intern_string = sys.intern
+
+    def get_function(method):
+        return method
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:
+    # Django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
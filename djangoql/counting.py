@@ -0,0 +1,137 @@
+"""
+Count strategies for search results on large tables, see
+DjangoQLSearchMixin.djangoql_count_strategy.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.utils.functional import cached_property
+
+from .cache import LRUCache
+from .compat import EmptyResultSet
+
+
+# Numbers of objects, by database and SQL of the counted query
+count_cache = LRUCache(
+    maxsize=getattr(settings, 'DJANGOQL_COUNT_CACHE_SIZE', 1024),
+)
+
+
+class CappedCount(int):
+    """
+    Lower bound of the number of objects, displayed like "10000+"
+    """
+    def __str__(self):
+        return '%s+' % int.__repr__(self)
+
+    __repr__ = __str__
+
+
+def capped_count(queryset, cap):
+    """
+    Counts up to cap objects with a LIMITed subquery. Returns CappedCount if
+    there are more of them.
+    """
+    count = queryset.order_by()[:cap + 1].count()
+    if count > cap:
+        return CappedCount(cap)
+    return count
+
+
+@contextmanager
+def statement_timeout(connection, timeout):
+    """
+    Makes queries which take longer than timeout seconds fail with
+    DatabaseError. Supported on PostgreSQL and SQLite only, queries on other
+    databases are not limited.
+    """
+    if connection.vendor == 'postgresql':
+        # Inside an outer transaction, atomic() is just a savepoint, and the
+        # setting would outlive it. Failed queries roll it back along with
+        # the savepoint, otherwise the previous value is restored.
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute('SHOW statement_timeout')
+                previous = cursor.fetchone()[0]
+                cursor.execute(
+                    'SET LOCAL statement_timeout = %s',
+                    [int(timeout * 1000)],
+                )
+            yield
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL statement_timeout = %s',
+                    [previous],
+                )
+    elif connection.vendor == 'sqlite':
+        connection.ensure_connection()
+        deadline = time.time() + timeout
+        # progress handler aborts the query when it returns true
+        connection.connection.set_progress_handler(
+            lambda: time.time() > deadline,
+            1000,
+        )
+        try:
+            yield
+        finally:
+            connection.connection.set_progress_handler(None, 1000)
+    else:
+        yield
+
+
+def exact_count(queryset, timeout=None, cap=10000):
+    """
+    Counts all objects. If it takes longer than timeout seconds, falls back
+    to capped_count().
+    """
+    if timeout is None:
+        return queryset.count()
+    try:
+        with statement_timeout(connections[queryset.db], timeout):
+            return queryset.count()
+    except DatabaseError:
+        return capped_count(queryset, cap)
+
+
+def cached_count(queryset, cache_timeout, count=exact_count):
+    """
+    Returns the number of objects counted by count function, and caches it
+    for cache_timeout seconds. Querysets with the same SQL share the number.
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        # queryset.none(), like the result of an invalid search
+        return 0
+    key = (queryset.db, sql, tuple(params))
+    try:
+        result = count_cache.get(key)
+    except TypeError:
+        # unhashable parameters
+        return count(queryset)
+    if result is None:
+        result = count(queryset)
+        count_cache.set(key, result, ttl=cache_timeout)
+    return result
+
+
+class CountingPaginator(Paginator):
+    """
+    Paginator which counts objects with given function
+    """
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super(CountingPaginator, self).__init__(
+            object_list,
+            per_page,
+            **kwargs
+        )
+        self.count_function = count
+
+    @cached_property
+    def count(self):
+        if self.count_function is None:
+            return super(CountingPaginator, self).count
+        return self.count_function(self.object_list)
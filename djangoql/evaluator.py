@@ -0,0 +1,479 @@
+"""
+Evaluation of DjangoQL searches in Python, against objects which aren't in
+the database: model instances, or nested dicts like decoded JSON.
+
+Search is compiled into Python source of a predicate function, so that
+evaluating it for each object costs about as much as a hand-written
+condition, without walking the tree. Comparisons follow the semantics of
+database lookups:
+
+- None is equal to None only, and doesn't match >, >=, <, <= or ~;
+- ~ is case-insensitive "contains";
+- negated comparisons, like != or not in, match everything the positive
+  ones don't, including None;
+- lists and related managers are treated as multi-valued relations, like
+  author.groups.name or tags: the comparison matches if any of the related
+  objects or items matches it. Missing or empty relations are compared as
+  None;
+- values which can't be compared, like strings and numbers with >, don't
+  match.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Manager
+from django.db.models.fields.related import ForeignObjectRel
+
+from .ast import List, Logical, flatten
+from .compat import text_type
+from .optimizer import optimize
+from .parser import get_parser
+from .queryset import negated_operators, query_cache
+from .schema import DjangoQLSchema
+
+
+multivalued_types = (list, tuple, Manager)
+# exact types of multi-valued values in dicts, checked faster
+sequence_types = frozenset([list, tuple])
+
+# module globals available in generated code
+helpers = (
+    'any_match',
+    'match_contains',
+    'match_equal',
+    'match_ge',
+    'match_gt',
+    'match_in',
+    'match_le',
+    'match_lt',
+    'match_none',
+    'multivalued_types',
+    'resolve_path',
+    'safe_compare',
+    'sequence_types',
+    'text_type',
+)
+
+
+def safe_compare(function, a, b):
+    """
+    Comparison which doesn't match values that can't be compared, like
+    strings and numbers, or unhashable values and sets
+    """
+    try:
+        return function(a, b)
+    except TypeError:
+        return False
+
+
+def resolve_path(obj, names):
+    """
+    Returns a list of values at given path of names, collected from all
+    objects of multi-valued relations on the way. Missing or empty relations
+    produce [None].
+    """
+    values = [obj]
+    for name in names:
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                value = value.get(name)
+            elif value is not None:
+                value = getattr(value, name, None)
+            if isinstance(value, (list, tuple)):
+                found.extend(value)
+            elif isinstance(value, Manager):
+                found.extend(value.all())
+            else:
+                found.append(value)
+        values = found
+    return values or [None]
+
+
+def any_match(match, values, constant):
+    """
+    Returns True if any of values matches constant, values which can't be
+    compared with it don't match
+    """
+    for value in values:
+        try:
+            if match(value, constant):
+                return True
+        except TypeError:
+            pass
+    return False
+
+
+# conditions for any_match(), by operator
+def match_none(value, constant):
+    return value is None
+
+
+def match_equal(value, constant):
+    return value == constant
+
+
+def match_in(value, values):
+    return value in values
+
+
+def match_contains(value, search):
+    return value is not None and search in text_type(value).lower()
+
+
+def match_gt(value, constant):
+    return value is not None and value > constant
+
+
+def match_ge(value, constant):
+    return value is not None and value >= constant
+
+
+def match_lt(value, constant):
+    return value is not None and value < constant
+
+
+def match_le(value, constant):
+    return value is not None and value <= constant
+
+
+matchers = {
+    '=': 'match_equal',
+    'in': 'match_in',
+    '~': 'match_contains',
+    '>': 'match_gt',
+    '>=': 'match_ge',
+    '<': 'match_lt',
+    '<=': 'match_le',
+}
+
+# the same conditions inlined into generated code, by matcher
+conditions = {
+    'match_none': '%(v)s is None',
+    'match_equal': '%(v)s == %(c)s',
+    'match_in': '%(v)s in %(c)s',
+    'match_contains': (
+        '(%(v)s is not None and %(c)s in text_type(%(v)s).lower())'
+    ),
+    'match_gt': '(%(v)s is not None and %(v)s > %(c)s)',
+    'match_ge': '(%(v)s is not None and %(v)s >= %(c)s)',
+    'match_lt': '(%(v)s is not None and %(v)s < %(c)s)',
+    'match_le': '(%(v)s is not None and %(v)s <= %(c)s)',
+}
+
+
+def attribute_name(relation):
+    """
+    Name of model instance attribute for a relation field, which is
+    different from the lookup name for reverse relations, like 'book_set'
+    for 'book'.
+    """
+    try:
+        field = relation.model._meta.get_field(relation.name)
+    except FieldDoesNotExist:
+        return relation.name
+    if isinstance(field, ForeignObjectRel):
+        return field.get_accessor_name()
+    return relation.name
+
+
+def resolve_names(expr, schema_instance, access):
+    """
+    Returns (names, value, multivalued) for a comparison: a list of names to
+    get from objects, the value to compare with, and whether the names go
+    through multi-valued relations.
+    """
+    names = list(expr.left.parts)
+    value = expr.right.value
+    if schema_instance is None:
+        return names, value, False
+    field = schema_instance.resolve_name(expr.left)
+    relations = schema_instance.resolve_path(
+        names if field is None else names[:-1],
+    )
+    multivalued = any(relation.multivalued for relation in relations)
+    if field is not None:
+        if isinstance(expr.right, List):
+            value = [field.get_lookup_value(v) for v in value]
+        else:
+            value = field.get_lookup_value(value)
+    if access == 'attribute':
+        names = [attribute_name(relation) for relation in relations]
+        if field is not None:
+            names.extend(field.get_lookup_name().split('__'))
+    return names, value, multivalued
+
+
+class PredicateBuilder(object):
+    """
+    Generates Python source of a predicate function. Values and paths are
+    passed into the generated code as closure variables.
+
+    Comparisons through dotted paths are compiled into functions generated
+    once for each path and matcher, with the value passed as argument, so
+    that long searches don't produce a function per comparison. They get
+    values along the path inline, and fall back to resolve_path() when they
+    meet a multi-valued relation.
+
+    Comparisons in the fast version may raise TypeError, like for values of
+    different types compared with >. The safe version, in which such
+    comparisons don't match, is built with safe=True.
+    """
+    def __init__(self, schema_instance=None, access='item', safe=False):
+        self.schema_instance = schema_instance
+        self.access = access
+        if access == 'item':
+            self.getter = '%s.get(%r)'
+            self.multivalued = 'type(%s) in sequence_types'
+        else:
+            self.getter = 'getattr(%s, %r, None)'
+            self.multivalued = 'isinstance(%s, multivalued_types)'
+        self.constants = []
+        # constants with lists of names, by path
+        self.paths = {}
+        # local variables with values of top-level names
+        self.variables = {}
+        # names of functions which compare values of dotted paths, by path
+        # and matcher
+        self.path_functions = {}
+        self.functions = []
+        self.safe = safe
+
+    def constant(self, value):
+        self.constants.append(value)
+        return 'c%s' % (len(self.constants) - 1)
+
+    def path(self, names):
+        key = tuple(names)
+        if key not in self.paths:
+            self.paths[key] = self.constant(names)
+        return self.paths[key]
+
+    def variable(self, name):
+        if name not in self.variables:
+            self.variables[name] = 'v%s' % len(self.variables)
+        return self.variables[name]
+
+    def build(self, expr):
+        return self.source(self.expression(expr))
+
+    def expression(self, expr):
+        results = []
+        stack = [(expr, None)]
+        while stack:
+            node, operands = stack.pop()
+            if operands is not None:
+                children = results[-len(operands):]
+                del results[-len(operands):]
+                results.append('(%s)' % (
+                    ' %s ' % node.operator.operator
+                ).join(children))
+            elif isinstance(node.operator, Logical):
+                operands = flatten(node)
+                stack.append((node, operands))
+                stack.extend((operand, None) for operand in reversed(operands))
+            else:
+                results.append(self.comparison(node))
+        return results[0]
+
+    def comparison(self, expr):
+        names, value, multivalued = resolve_names(
+            expr,
+            self.schema_instance,
+            self.access,
+        )
+        operator = expr.operator.operator
+        positive = negated_operators.get(operator, operator)
+        if positive == '=' and value is None:
+            matcher, constant = 'match_none', 'None'
+        elif positive != 'in' and value is None:
+            # database lookups don't match None with other operators
+            matcher = None
+        else:
+            if positive == 'in':
+                value = frozenset(i for i in value if i is not None)
+            elif positive == '~':
+                value = text_type(value).lower()
+            matcher, constant = matchers[positive], self.constant(value)
+        if matcher is None:
+            condition = 'False'
+        elif len(names) > 1 or multivalued:
+            condition = '%s(obj, %s)' % (
+                self.path_function(names, matcher),
+                constant,
+            )
+        else:
+            # lists or related managers are compared like multi-valued
+            # relations
+            v = self.variable(names[0])
+            condition = '(%s if %s else %s)' % (
+                'any_match(%s, resolve_path(obj, %s), %s)' % (
+                    matcher,
+                    self.path(names),
+                    constant,
+                ),
+                self.multivalued % v,
+                self.condition(matcher, v, constant),
+            )
+        if positive != operator:
+            return '(not %s)' % condition
+        return condition
+
+    def path_function(self, names, matcher):
+        """
+        Returns name of the function which compares values at the path with
+        its argument, generated once for each path and matcher
+        """
+        key = (tuple(names), matcher)
+        if key in self.path_functions:
+            return self.path_functions[key]
+        function = 'p%s' % len(self.path_functions)
+        lines = [
+            'def %s(obj, constant):' % function,
+            '    v = %s' % (self.getter % ('obj', str(names[0]))),
+        ]
+        if self.access == 'item':
+            # fast check for nested dicts
+            single = 'v is None or type(v) is dict'
+        else:
+            single = 'not isinstance(v, multivalued_types)'
+        indent = '    '
+        for name in names[1:]:
+            lines.extend([
+                indent + 'if %s:' % single,
+                indent + '    if v is not None:',
+                indent + '        v = %s' % (self.getter % ('v', str(name))),
+            ])
+            indent += '    '
+        condition = self.condition(matcher, 'v', 'constant')
+        lines.extend([
+            indent + 'if not isinstance(v, multivalued_types):',
+            indent + '    return %s' % condition,
+            '    for v in resolve_path(obj, %s):' % self.path(names),
+            '        if %s:' % condition,
+            '            return True',
+            '    return False',
+        ])
+        self.functions.append(lines)
+        self.path_functions[key] = function
+        return function
+
+    def condition(self, matcher, v, constant):
+        if self.safe and matcher in ('match_in', 'match_gt', 'match_ge',
+                                     'match_lt', 'match_le'):
+            return 'safe_compare(%s, %s, %s)' % (matcher, v, constant)
+        return conditions[matcher] % {'v': v, 'c': constant}
+
+    def source(self, expression):
+        lines = ['def make(%s, constants, fallback):' % ', '.join(helpers)]
+        if self.constants:
+            # unpacked into closure variables, functions can't have more
+            # than 255 arguments on older Pythons
+            lines.append('    %s, = constants' % ', '.join(
+                ['c%s' % i for i in range(len(self.constants))]
+            ))
+        for function in self.functions:
+            lines.extend('    ' + line for line in function)
+        lines.append('    def predicate(obj):')
+        for name, variable in sorted(self.variables.items()):
+            lines.append('        %s = %s' % (
+                variable,
+                self.getter % ('obj', str(name)),
+            ))
+        if self.safe:
+            lines.append('        return %s' % expression)
+        else:
+            lines.extend([
+                '        try:',
+                '            return %s' % expression,
+                '        except TypeError:',
+                '            return fallback(obj)',
+            ])
+        lines.append('    return predicate')
+        return '\n'.join(lines) + '\n'
+
+
+def safe_fallback(expr, schema_instance, access):
+    """
+    Returns a function which evaluates the safe version of the expression,
+    compiled when it's called for the first time
+    """
+    predicates = []
+
+    def fallback(obj):
+        if not predicates:
+            predicates.append(
+                build_predicate(expr, schema_instance, access, safe=True),
+            )
+        return predicates[0](obj)
+    return fallback
+
+
+def build_predicate(expr, schema_instance=None, access='item', safe=False):
+    """
+    Compiles validated DjangoQL AST into a function which receives an object
+    and returns True if it matches the expression.
+
+    :param schema_instance: schema which validated the expression. If it's
+        specified, lookup names and values of its fields are used, and
+        multi-valued relations are recognized by the schema.
+    :param access: 'item' to get values of dicts with obj.get(name), or
+        'attribute' for objects, like model instances
+    :param safe: compile the version in which values that can't be compared
+        don't match, instead of raising TypeError. Otherwise it's compiled
+        on the first TypeError, and used for objects which raise it.
+    """
+    if access not in ('item', 'attribute'):
+        raise ValueError('access must be "item" or "attribute"')
+    builder = PredicateBuilder(schema_instance, access, safe)
+    source = builder.build(expr)
+    namespace = {}
+    exec(compile(source, '<djangoql>', 'exec'), namespace)
+    predicate = namespace['make'](
+        *[globals()[name] for name in helpers],
+        constants=builder.constants,
+        fallback=None if safe else safe_fallback(expr, schema_instance, access)
+    )
+    predicate.source = source
+    return predicate
+
+
+def compile_predicate(search, model=None, schema=None, access=None):
+    """
+    Parses search written in DjangoQL mini-language, and compiles it into a
+    predicate function, see build_predicate().
+
+    If model is specified, search is validated vs. schema of the model, and
+    values are converted like for database lookups, for example dates are
+    parsed into date objects. Without model, names and values are used as
+    they are. Access defaults to 'attribute' with model and 'item' without.
+
+    Predicates are cached along with queries, see invalidate_query_cache().
+    """
+    if access is None:
+        access = 'item' if model is None else 'attribute'
+    if model is not None:
+        schema = schema or DjangoQLSchema
+    key = (schema, model, search, 'predicate', access)
+    if schema is None or schema.cache_queries:
+        predicate = query_cache.get(key)
+        if predicate is not None:
+            return predicate
+    ast = get_parser().parse(search)
+    schema_instance = None
+    if model is not None:
+        schema_instance = schema(model)
+        ast = schema_instance.validate(ast)
+        if schema_instance.optimizer_passes:
+            ast = optimize(ast, schema_instance.optimizer_passes)
+    predicate = build_predicate(ast, schema_instance, access)
+    if schema is None or schema.cache_queries:
+        query_cache.set(key, predicate)
+    return predicate
+
+
+def filter_objects(objects, search, model=None, schema=None, access=None):
+    """
+    Yields objects which match search, see compile_predicate(). Search is
+    compiled immediately, so that errors are raised before iteration.
+    """
+    predicate = compile_predicate(search, model, schema, access)
+    return (obj for obj in objects if predicate(obj))
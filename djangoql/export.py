@@ -0,0 +1,119 @@
+"""
+Export of schema introspections into static files, so that completion could
+load them from a CDN instead of computing them at request time. See
+djangoql_export_schema management command.
+
+Files are named after model label and content hash, like
+djangoql/introspections/auth.user.0123456789ab.json, so they can be cached
+forever. Manifest file maps schema and model to the latest exported file.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .compat import text_type
+
+
+MANIFEST = 'djangoql/introspections/manifest.json'
+
+_manifest = {}
+_manifest_lock = threading.Lock()
+
+
+def introspections_root():
+    return getattr(settings, 'DJANGOQL_INTROSPECTIONS_ROOT', None) or \
+        settings.STATIC_ROOT
+
+
+def introspections_url():
+    return getattr(settings, 'DJANGOQL_INTROSPECTIONS_URL', None) or \
+        settings.STATIC_URL
+
+
+def schema_key(schema, model):
+    """
+    Manifest key of a schema class and a model, like
+    'djangoql.schema.DjangoQLSchema:auth.user'
+    """
+    return '%s.%s:%s' % (
+        schema.__module__,
+        schema.__name__,
+        text_type(model._meta),
+    )
+
+
+def export_introspection(schema, model, root):
+    """
+    Writes introspection of a model into a file under given root directory,
+    unless an identical one exists already. Returns path of the file,
+    relative to the root.
+    """
+    introspection = schema(model).as_dict()
+    # stable order of models, so that unchanged schema has the same hash
+    introspection['models'] = OrderedDict(
+        sorted(introspection['models'].items())
+    )
+    content = json.dumps(introspection, separators=(',', ':')).\
+        encode('utf-8')
+    path = '%s/%s.%s.json' % (
+        os.path.dirname(MANIFEST),
+        introspection['current_model'],
+        hashlib.md5(content).hexdigest()[:12],
+    )
+    filename = os.path.join(root, path)
+    if not os.path.exists(filename):
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(filename, 'wb') as f:
+            f.write(content)
+    return path
+
+
+def write_manifest(paths, root):
+    """
+    Merges {schema key: path} mapping into manifest under given root
+    directory. Manifest is replaced atomically, so that running processes
+    never read partially written one.
+    """
+    manifest = read_manifest(root)
+    manifest.update(paths)
+    filename = os.path.join(root, MANIFEST)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.rename(filename + '.tmp', filename)
+
+
+def read_manifest(root):
+    filename = os.path.join(root, MANIFEST)
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def static_introspection_url(schema, model):
+    """
+    Returns URL of exported introspection of a model, or None if it wasn't
+    exported. Manifest is re-read when it changes.
+    """
+    root = introspections_root()
+    if not root:
+        return None
+    try:
+        mtime = os.path.getmtime(os.path.join(root, MANIFEST))
+    except OSError:
+        return None
+    with _manifest_lock:
+        if _manifest.get('key') != (root, mtime):
+            _manifest['key'] = (root, mtime)
+            _manifest['paths'] = read_manifest(root)
+        path = _manifest['paths'].get(schema_key(schema, model))
+    if path is None:
+        return None
+    return introspections_url() + path
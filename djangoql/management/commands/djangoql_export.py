@@ -0,0 +1,75 @@
+import io
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from ...compat import text_type
+from ...exceptions import DjangoQLError
+from ...streaming import export_lines, formats
+
+
+class Command(BaseCommand):
+    help = 'Exports objects which match DjangoQL search into CSV or ' \
+           'JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', metavar='app_label.model')
+        parser.add_argument(
+            'search',
+            nargs='?',
+            default='',
+            help='DjangoQL search, all objects are exported if omitted',
+        )
+        parser.add_argument(
+            '--columns',
+            help='Comma-separated list of exported fields, like '
+                 'name,author.email. All fields of the model by default',
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(formats),
+            default='csv',
+        )
+        parser.add_argument(
+            '--schema',
+            metavar='path.to.Schema',
+            help='Schema to use instead of default DjangoQLSchema',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of objects fetched from the database at once',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to, stdout by default',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+            schema = options['schema'] and import_string(options['schema'])
+        except (ImportError, LookupError, ValueError) as e:
+            raise CommandError(text_type(e))
+        columns = options['columns']
+        try:
+            lines = export_lines(
+                model._default_manager.all(),
+                search=options['search'],
+                columns=columns.split(',') if columns else None,
+                format=options['format'],
+                schema=schema or None,
+                chunk_size=options['chunk_size'],
+            )
+        except DjangoQLError as e:
+            raise CommandError(text_type(e))
+        if options['output']:
+            with io.open(options['output'], 'w', encoding='utf-8',
+                         newline='') as f:
+                for line in lines:
+                    f.write(text_type(line))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
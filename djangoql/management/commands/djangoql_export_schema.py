@@ -0,0 +1,62 @@
+from django.apps import apps
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from ...admin import DjangoQLSearchMixin
+from ...export import (
+    export_introspection,
+    introspections_root,
+    schema_key,
+    write_manifest,
+)
+
+
+class Command(BaseCommand):
+    help = 'Exports introspections of DjangoQL searches in admin, and of ' \
+           'given schemas, into static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'schemas',
+            nargs='*',
+            metavar='path.to.Schema:app_label.model',
+            help='Export introspection of this schema and model too',
+        )
+        parser.add_argument(
+            '--output',
+            help='Directory to write files to, defaults to '
+                 'DJANGOQL_INTROSPECTIONS_ROOT or STATIC_ROOT setting',
+        )
+        parser.add_argument(
+            '--no-admin',
+            action='store_false',
+            dest='admin',
+            help="Don't export introspections of admin searches",
+        )
+
+    def handle(self, *args, **options):
+        root = options['output'] or introspections_root()
+        if not root:
+            raise CommandError(
+                'Please specify --output directory, or set STATIC_ROOT',
+            )
+        pairs = []
+        if options['admin']:
+            for model, model_admin in admin.site._registry.items():
+                if isinstance(model_admin, DjangoQLSearchMixin) and \
+                        model_admin.djangoql_completion:
+                    pairs.append((model_admin.djangoql_schema, model))
+        for value in options['schemas']:
+            try:
+                schema, label = value.split(':')
+                pairs.append((import_string(schema), apps.get_model(label)))
+            except (ImportError, LookupError, ValueError) as e:
+                raise CommandError('Invalid schema %s: %s' % (value, e))
+        paths = {}
+        for schema, model in pairs:
+            key = schema_key(schema, model)
+            if key not in paths:
+                paths[key] = export_introspection(schema, model, root)
+                self.stdout.write('%s: %s' % (key, paths[key]))
+        write_manifest(paths, root)
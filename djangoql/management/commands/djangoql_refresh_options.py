@@ -0,0 +1,40 @@
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+
+from ...admin import DjangoQLSearchMixin
+
+
+class Command(BaseCommand):
+    help = 'Refreshes precomputed suggestion options of DjangoQL searches ' \
+           'in admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            metavar='app_label.model',
+            help='Refresh options of fields of these models only',
+        )
+
+    def handle(self, *args, **options):
+        labels = set(label.lower() for label in options['models'])
+        seen = set()
+        for model, model_admin in admin.site._registry.items():
+            if not isinstance(model_admin, DjangoQLSearchMixin):
+                continue
+            schema = model_admin.djangoql_schema(model)
+            for label, fields in schema.models.items():
+                if labels and label not in labels:
+                    continue
+                for field in fields.values():
+                    key = (type(field), field.model, field.name)
+                    if field.options_strategy != 'precomputed' or \
+                            key in seen:
+                        continue
+                    seen.add(key)
+                    count = field.refresh_precomputed_options()
+                    self.stdout.write('%s.%s: %s options' % (
+                        label,
+                        field.name,
+                        count,
+                    ))
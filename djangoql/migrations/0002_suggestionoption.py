@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 02:14
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('djangoql', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionOption',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=255, verbose_name='field name')),
+                ('value', models.CharField(max_length=255, verbose_name='option value')),
+                ('count', models.PositiveIntegerField(verbose_name='number of rows with this value')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType', verbose_name='related model')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='suggestionoption',
+            index_together=set([('model', 'field', 'count')]),
+        ),
+    ]
@@ -12,3 +12,20 @@ class Query(models.Model):
         settings.AUTH_USER_MODEL, verbose_name='query owner')
     public = models.BooleanField(
         default=False, verbose_name='makes this query publicly visible')
+
+
+class SuggestionOption(models.Model):
+    """
+    Suggestion option of a field, stored by 'precomputed' suggestion strategy
+    """
+    model = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, verbose_name='related model')
+    field = models.CharField(
+        max_length=255, verbose_name='field name')
+    value = models.CharField(
+        max_length=255, verbose_name='option value')
+    count = models.PositiveIntegerField(
+        verbose_name='number of rows with this value')
+
+    class Meta:
+        index_together = [('model', 'field', 'count')]
@@ -0,0 +1,295 @@
+"""
+Optional optimization passes over DjangoQL AST.
+
+Queries generated by scripts often contain redundant terms, like
+'a = 1 or a = 2 or a = 3' or 'x > 5 and x > 7'. Optimizer rewrites them into
+equivalent, but smaller expressions, which produce shorter SQL and better
+query plans.
+
+Each pass is a function which receives an operator of a logical chain ('and'
+or 'or') and a list of its already optimized operands, and returns a new list
+of operands. Passes may replace operands with TRUE or FALSE constants, which
+are then absorbed by the enclosing expressions.
+"""
+from decimal import Decimal
+
+from .ast import Comparison, Const, Expression, List, Logical, flatten
+
+
+class BooleanConstant(object):
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return '<%s>' % self.value
+
+
+TRUE = BooleanConstant(True)
+FALSE = BooleanConstant(False)
+
+
+def is_comparison(node):
+    return isinstance(node, Expression) and \
+        isinstance(node.operator, Comparison)
+
+
+def is_number(value):
+    return isinstance(value, (int, float, Decimal)) and \
+        not isinstance(value, bool)
+
+
+def comparison_key(node):
+    """
+    Hashable key of a comparison, values are compared along with their types,
+    so that 1 and True are different.
+    """
+    if isinstance(node.right, List):
+        value = tuple((type(v), v) for v in node.right.value)
+    else:
+        value = (type(node.right.value), node.right.value)
+    return node.left.parts, node.operator.operator, value
+
+
+def comparison(name, operator, value):
+    if isinstance(value, list):
+        value = List(items=[Const(value=v) for v in value])
+    else:
+        value = Const(value=value)
+    return Expression(
+        left=name,
+        operator=Comparison(operator=operator),
+        right=value,
+    )
+
+
+def remove_duplicates(operator, operands):
+    """
+    a = 1 and a = 1 => a = 1
+    (a = 1 or b = 2) and (a = 1 or b = 2) => a = 1 or b = 2
+    """
+    seen = set()
+    result = []
+    for node in operands:
+        key = comparison_key(node) if is_comparison(node) else node
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(node)
+    return result
+
+
+range_operators = ('>', '>=', '<', '<=')
+
+
+def tighter(op1, value1, op2, value2, upper):
+    """
+    Returns True if the first bound is tighter than the second one
+    """
+    if value1 == value2:
+        return op1 in ('>', '<')
+    return (value1 < value2) == upper
+
+
+def merge_ranges(operator, operands):
+    """
+    x > 5 and x > 7 => x > 7
+    x > 5 or x > 7 => x > 5
+    """
+    bounds = {}
+    for i, node in enumerate(operands):
+        if is_comparison(node) and \
+                node.operator.operator in range_operators and \
+                is_number(node.right.value):
+            upper = node.operator.operator in ('<', '<=')
+            bounds.setdefault((node.left.parts, upper), []).append(i)
+    drop = set()
+    for (_, upper), indices in bounds.items():
+        if len(indices) < 2:
+            continue
+        best = indices[0]
+        for i in indices[1:]:
+            node, best_node = operands[i], operands[best]
+            is_tighter = tighter(
+                node.operator.operator, node.right.value,
+                best_node.operator.operator, best_node.right.value,
+                upper,
+            )
+            # "and" keeps the tightest bound, "or" keeps the loosest one
+            if is_tighter == (operator == 'and'):
+                best = i
+        drop.update(i for i in indices if i != best)
+    return [node for i, node in enumerate(operands) if i not in drop]
+
+
+def fold_in(operator, operands):
+    """
+    a = 1 or a = 2 or a in (3, 4) => a in (1, 2, 3, 4)
+    a != 1 and a != 2 and a not in (3, 4) => a not in (1, 2, 3, 4)
+    """
+    if operator == 'or':
+        single, multiple = '=', 'in'
+    else:
+        single, multiple = '!=', 'not in'
+    groups = {}
+    for i, node in enumerate(operands):
+        if not is_comparison(node):
+            continue
+        if node.operator.operator == single and \
+                node.right.value is not None:
+            values = [node.right.value]
+        elif node.operator.operator == multiple:
+            values = node.right.value
+        else:
+            continue
+        groups.setdefault(node.left.parts, []).append((i, values))
+    replace = {}
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        seen = set()
+        values = []
+        for _, items in indices:
+            for value in items:
+                if (type(value), value) not in seen:
+                    seen.add((type(value), value))
+                    values.append(value)
+        first = indices[0][0]
+        name = operands[first].left
+        replace[first] = comparison(name, multiple, values)
+        replace.update((i, None) for i, _ in indices[1:])
+    result = []
+    for i, node in enumerate(operands):
+        node = replace.get(i, node)
+        if node is not None:
+            result.append(node)
+    return result
+
+
+def fold_constants(operator, operands):
+    """
+    Replaces contradictions in "and" chains with FALSE, and tautologies in
+    "or" chains with TRUE:
+
+    x = None and x != None => FALSE
+    x = 1 and x = 2 => FALSE
+    x > 7 and x < 3 => FALSE
+    x = None or x != None => TRUE
+
+    Only fields of the current model are checked. For fields of multi-valued
+    relations conditions may be satisfied by different related objects.
+    """
+    by_name = {}
+    for node in operands:
+        if is_comparison(node) and len(node.left.parts) == 1:
+            by_name.setdefault(node.left.parts[0], []).append(node)
+    for nodes in by_name.values():
+        if len(nodes) < 2:
+            continue
+        operators = dict(
+            (n.operator.operator, n) for n in nodes
+            if not isinstance(n.right, List) and n.right.value is None
+        )
+        if '=' in operators and '!=' in operators:
+            return [FALSE if operator == 'and' else TRUE]
+        if operator != 'and':
+            continue
+        equal = set(
+            n.right.value for n in nodes
+            if n.operator.operator == '=' and is_number(n.right.value)
+        )
+        if len(equal) > 1:
+            return [FALSE]
+        lower = [
+            n for n in nodes
+            if n.operator.operator in ('>', '>=') and is_number(n.right.value)
+        ]
+        upper = [
+            n for n in nodes
+            if n.operator.operator in ('<', '<=') and is_number(n.right.value)
+        ]
+        for low in lower:
+            for high in upper:
+                if low.right.value > high.right.value or (
+                    low.right.value == high.right.value and
+                    (low.operator.operator == '>' or
+                     high.operator.operator == '<')
+                ):
+                    return [FALSE]
+    return operands
+
+
+DEFAULT_PASSES = (
+    remove_duplicates,
+    merge_ranges,
+    fold_in,
+    fold_constants,
+)
+
+
+def absorb_constants(operator, operands):
+    absorbing, neutral = (FALSE, TRUE) if operator == 'and' else (TRUE, FALSE)
+    if any(node is absorbing for node in operands):
+        return absorbing
+    operands = [node for node in operands if node is not neutral]
+    if not operands:
+        return neutral
+    return operands
+
+
+def combine(operator, operands):
+    expression = operands[-1]
+    for node in reversed(operands[:-1]):
+        expression = Expression(
+            left=node,
+            operator=Logical(operator=operator),
+            right=expression,
+        )
+    return expression
+
+
+def optimize(node, passes=DEFAULT_PASSES):
+    """
+    Applies optimization passes to every logical chain in the tree, bottom-up.
+    Returns a new tree, the original one is not modified.
+
+    If the whole expression turns out to be always true or always false, it's
+    returned unchanged, because there's no way to express that in DjangoQL.
+    """
+    results = []
+    stack = [(node, None)]
+    while stack:
+        current, operands = stack.pop()
+        if operands is not None:
+            children = results[-len(operands):]
+            del results[-len(operands):]
+            operator = current.operator.operator
+            flat = []
+            for child in children:
+                # Passes could collapse a child into the same kind of chain
+                if isinstance(child, Expression) and \
+                        isinstance(child.operator, Logical) and \
+                        child.operator.operator == operator:
+                    flat.extend(flatten(child))
+                else:
+                    flat.append(child)
+            flat = absorb_constants(operator, flat)
+            for optimization in passes:
+                if isinstance(flat, BooleanConstant):
+                    break
+                flat = absorb_constants(operator, optimization(operator, flat))
+            if isinstance(flat, BooleanConstant):
+                results.append(flat)
+            elif len(flat) == 1:
+                results.append(flat[0])
+            else:
+                results.append(combine(operator, flat))
+        elif isinstance(current.operator, Logical):
+            operands = flatten(current)
+            stack.append((current, operands))
+            stack.extend((operand, None) for operand in reversed(operands))
+        else:
+            results.append(current)
+    result = results[0]
+    if isinstance(result, BooleanConstant):
+        return node
+    return result
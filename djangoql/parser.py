@@ -1,14 +1,16 @@
 from __future__ import unicode_literals
 
 import re
+import threading
 from decimal import Decimal
 
 import ply.yacc as yacc
+from django.conf import settings
 
 from .ast import *  # noqa
 from .compat import binary_type, text_type
 from .exceptions import DjangoQLParserError
-from .lexer import DjangoQLLexer
+from .lexer import DjangoQLFastLexer, DjangoQLLexer
 
 
 unescape_pattern = re.compile(
@@ -31,15 +33,59 @@ def unescape(value):
     return re.sub(unescape_pattern, unescape_repl, value)
 
 
+_local = threading.local()
+
+
+def get_parser():
+    """
+    Returns DjangoQLParser instance with DjangoQLFastLexer, shared by all
+    callers in current thread.
+
+    Building a parser is expensive (PLY loads parse tables and compiles lexer
+    rules), but parsers and lexers are stateful and can't be used from several
+    threads at once, so we keep one instance per thread and reuse it.
+    """
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = DjangoQLParser(lexer=DjangoQLFastLexer())
+    return parser
+
+
 class DjangoQLParser(object):
-    def __init__(self, debug=False, **kwargs):
-        self.default_lexer = DjangoQLLexer()
+    """
+    DjangoQL parser. Supports two engines which produce identical results:
+
+    - 'ply': PLY-based LALR parser, built from the grammar defined in p_*
+      method docstrings below;
+    - 'descent': hand-written parser for the same grammar, which is faster
+      because it doesn't need a function call per grammar rule reduction.
+
+    Default engine can be set with DJANGOQL_PARSER_ENGINE setting. Optional
+    lexer argument sets default lexer instance, DjangoQLLexer is used if it's
+    not specified.
+    """
+    engines = ('ply', 'descent')
+
+    def __init__(self, debug=False, engine=None, lexer=None, **kwargs):
+        if engine is None:
+            engine = 'ply'
+            if settings.configured:
+                engine = getattr(settings, 'DJANGOQL_PARSER_ENGINE', engine)
+        if engine not in self.engines:
+            raise ValueError('Unknown parser engine: %s' % engine)
+        self.engine = engine
+        self.default_lexer = lexer or DjangoQLLexer()
         self.tokens = self.default_lexer.tokens
-        kwargs['debug'] = debug
-        self.yacc = yacc.yacc(module=self, **kwargs)
+        if engine == 'ply':
+            kwargs['debug'] = debug
+            self.yacc = yacc.yacc(module=self, **kwargs)
 
     def parse(self, input=None, lexer=None, **kwargs):
         lexer = lexer or self.default_lexer
+        if self.engine == 'descent':
+            if input is not None:
+                lexer.input(input)
+            return self.descent_parse(lexer)
         return self.yacc.parse(input=input, lexer=lexer, **kwargs)
 
     start = 'expression'
@@ -197,6 +243,122 @@ class DjangoQLParser(object):
         """
         p[0] = [p[1]]
 
+    # Recursive descent engine. It follows the grammar above: logical
+    # operators have no precedence and are right-associative, which is how
+    # PLY resolves shift/reduce conflicts of "expression logical expression".
+    # Logical chains and parenthesis are handled in a loop with explicit
+    # stack, so long queries can't hit recursion limit.
+
+    comparison_values = {
+        'EQUALS': ('INT_VALUE', 'FLOAT_VALUE', 'STRING_VALUE', 'TRUE',
+                   'FALSE', 'NONE'),
+        'NOT_EQUALS': ('INT_VALUE', 'FLOAT_VALUE', 'STRING_VALUE', 'TRUE',
+                       'FALSE', 'NONE'),
+        'GREATER': ('INT_VALUE', 'FLOAT_VALUE', 'STRING_VALUE'),
+        'GREATER_EQUAL': ('INT_VALUE', 'FLOAT_VALUE', 'STRING_VALUE'),
+        'LESS': ('INT_VALUE', 'FLOAT_VALUE', 'STRING_VALUE'),
+        'LESS_EQUAL': ('INT_VALUE', 'FLOAT_VALUE', 'STRING_VALUE'),
+        'CONTAINS': ('STRING_VALUE',),
+        'NOT_CONTAINS': ('STRING_VALUE',),
+    }
+    list_item_values = ('INT_VALUE', 'FLOAT_VALUE', 'STRING_VALUE', 'TRUE',
+                        'FALSE', 'NONE')
+
+    def descent_parse(self, lexer):
+        # Each frame is a flat list of operands interleaved with logical
+        # operators, a new frame is started by opening parenthesis
+        frames = [[]]
+        while True:
+            token = self.descent_expect(lexer, ('PAREN_L', 'NAME'))
+            if token.type == 'PAREN_L':
+                frames.append([])
+                continue
+            frames[-1].append(self.descent_comparison(lexer, token))
+            while True:
+                token = lexer.token()
+                if token is None and len(frames) == 1:
+                    return self.descent_fold(frames[0])
+                if token is not None:
+                    if token.type in ('AND', 'OR'):
+                        frames[-1].append(Logical(operator=token.value))
+                        break
+                    if token.type == 'PAREN_R' and len(frames) > 1:
+                        expression = self.descent_fold(frames.pop())
+                        frames[-1].append(expression)
+                        continue
+                self.descent_error(lexer, token)
+
+    def descent_fold(self, items):
+        expression = items[-1]
+        for i in range(len(items) - 2, 0, -2):
+            expression = Expression(
+                left=items[i - 1],
+                operator=items[i],
+                right=expression,
+            )
+        return expression
+
+    def descent_comparison(self, lexer, name_token):
+        name = Name(parts=name_token.value.split('.'))
+        token = self.descent_expect(lexer, (
+            'EQUALS', 'NOT_EQUALS', 'GREATER', 'GREATER_EQUAL', 'LESS',
+            'LESS_EQUAL', 'CONTAINS', 'NOT_CONTAINS', 'IN', 'NOT',
+        ))
+        if token.type in ('IN', 'NOT'):
+            if token.type == 'NOT':
+                operator = '%s %s' % (
+                    token.value,
+                    self.descent_expect(lexer, ('IN',)).value,
+                )
+            else:
+                operator = token.value
+            self.descent_expect(lexer, ('PAREN_L',))
+            items = []
+            while True:
+                items.append(self.descent_const(
+                    self.descent_expect(lexer, self.list_item_values),
+                ))
+                token = self.descent_expect(lexer, ('COMMA', 'PAREN_R'))
+                if token.type == 'PAREN_R':
+                    break
+            value = List(items=items)
+        else:
+            operator = token.value
+            value = self.descent_const(self.descent_expect(
+                lexer,
+                self.comparison_values[token.type],
+            ))
+        return Expression(
+            left=name,
+            operator=Comparison(operator=operator),
+            right=value,
+        )
+
+    def descent_const(self, token):
+        if token.type == 'INT_VALUE':
+            return Const(value=int(token.value))
+        elif token.type == 'FLOAT_VALUE':
+            return Const(value=Decimal(token.value))
+        elif token.type == 'STRING_VALUE':
+            return Const(value=unescape(token.value))
+        elif token.type == 'TRUE':
+            return Const(value=True)
+        elif token.type == 'FALSE':
+            return Const(value=False)
+        return Const(value=None)
+
+    def descent_expect(self, lexer, types):
+        token = lexer.token()
+        if token is None or token.type not in types:
+            self.descent_error(lexer, token)
+        return token
+
+    def descent_error(self, lexer, token):
+        # Same as PLY does before calling p_error()
+        if token is not None and not hasattr(token, 'lexer'):
+            token.lexer = lexer
+        self.p_error(token)
+
     def p_error(self, token):
         if token is None:
             self.raise_syntax_error('Unexpected end of input')
@@ -1,19 +1,96 @@
-from django.db.models import QuerySet
+from collections import OrderedDict, namedtuple
 
-from .ast import Logical
-from .parser import DjangoQLParser
+from django.conf import settings
+from django.core.exceptions import FieldError, ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import (
+    Case,
+    Count,
+    IntegerField,
+    Q,
+    QuerySet,
+    Value,
+    When,
+)
+
+from .ast import Logical, flatten
+from .cache import LRUCache
+from .exceptions import DjangoQLError
+from .optimizer import optimize
+from .parser import get_parser
 from .schema import DjangoQLField, DjangoQLSchema
 
 
+query_cache = LRUCache(
+    maxsize=getattr(settings, 'DJANGOQL_QUERY_CACHE_SIZE', 512),
+)
+
+
 def build_filter(expr, schema_instance):
-    if isinstance(expr.operator, Logical):
-        left = build_filter(expr.left, schema_instance)
-        right = build_filter(expr.right, schema_instance)
-        if expr.operator.operator == 'or':
-            return left | right
+    """
+    Builds Q-object for given expression.
+
+    A chain of logical expressions with the same operator produces a single
+    Q-object with a flat list of children instead of nested pairs, which is
+    faster to build and compile for Django. The tree is walked with explicit
+    stack, so queries with thousands of terms don't hit recursion limit.
+    """
+    results = []
+    stack = [(expr, None)]
+    while stack:
+        node, operands = stack.pop()
+        if operands is not None:
+            # Lookups for all operands are on top of results now
+            children = results[-len(operands):]
+            del results[-len(operands):]
+            results.append(combine_lookups(
+                operator=node.operator.operator,
+                children=children,
+                match=schema_instance.relation_match,
+            ))
+        elif isinstance(node.operator, Logical):
+            operands = flatten(node)
+            stack.append((node, operands))
+            stack.extend((operand, None) for operand in reversed(operands))
         else:
-            return left & right
+            results.append(resolve_lookup(node, schema_instance))
+    return as_q(results[0])
+
+
+negated_operators = {
+    '!=': '=',
+    '!~': '~',
+    'not in': 'in',
+}
+
+
+class RelationLookup(namedtuple(
+        'RelationLookup', 'relation prefix lookups connector negated')):
+    """
+    Lookups through multi-valued relation which are compiled into a single
+    subquery, see subquery_lookup(). Lookups are relative to the model which
+    has the relation, and are combined with connector. If negated is True,
+    lookups are positive versions of negated conditions, and the subquery is
+    used in NOT IN.
+    """
+
+    @property
+    def key(self):
+        return tuple(self.prefix) + (self.relation.name, self.negated)
+
+
+def build_lookup(expr, schema_instance):
+    """
+    Builds Q-object for a single comparison
+    """
+    return as_q(resolve_lookup(expr, schema_instance))
+
 
+def resolve_lookup(expr, schema_instance):
+    """
+    Returns Q-object for a single comparison, or RelationLookup if it should
+    be compiled into a subquery, see relation_subqueries schema option.
+    """
     field = schema_instance.resolve_name(expr.left)
     if not field:
         # That must be a reference to a model without specifying a field.
@@ -22,22 +99,223 @@ def build_filter(expr, schema_instance):
             name=expr.left.parts[-1],
             nullable=True,
         )
+    path = list(expr.left.parts[:-1])
+    if schema_instance.relation_subqueries:
+        relations = schema_instance.resolve_path(path)
+        for i, relation in enumerate(relations):
+            if relation.multivalued:
+                # Negated conditions are compiled into NOT IN with subquery
+                # for the positive condition, an anti-join, instead of
+                # subquery with nested NOT IN inside
+                operator = expr.operator.operator
+                positive = negated_operators.get(operator, operator)
+                return RelationLookup(
+                    relation=relation,
+                    prefix=path[:i],
+                    lookups=[field.get_lookup(
+                        path=path[i:],
+                        operator=positive,
+                        value=expr.right.value,
+                    )],
+                    connector=Q.AND,
+                    negated=positive != operator,
+                )
     return field.get_lookup(
-        path=expr.left.parts[:-1],
+        path=path,
         operator=expr.operator.operator,
         value=expr.right.value,
     )
 
 
+def combine_lookups(operator, children, match='any'):
+    """
+    Combines lookups of a logical chain into a single Q-object.
+
+    Lookups through the same multi-valued relation are merged into a single
+    subquery where that doesn't change the meaning of the query:
+
+    - "or" of positive conditions: related object matching either condition;
+    - "and" of negated conditions: no related object matching any condition,
+      NOT IN (a) AND NOT IN (b) is the same as NOT IN (a OR b);
+    - "and" of positive conditions, only if match is 'same': a single related
+      object must match all conditions.
+    """
+    connector = Q.OR if operator == 'or' else Q.AND
+    groups = OrderedDict()
+    for child in children:
+        if isinstance(child, RelationLookup) and (
+            (operator == 'or' and not child.negated) or
+            (operator == 'and' and child.negated) or
+            (operator == 'and' and match == 'same')
+        ):
+            group = groups.get(child.key)
+            if group is None:
+                groups[child.key] = child._replace(
+                    lookups=list(child.lookups),
+                    connector=Q.OR if child.negated else connector,
+                )
+            else:
+                group.lookups.extend(child.lookups)
+        else:
+            groups[len(groups), None] = child
+    q = Q()
+    q.connector = connector
+    q.children = [as_q(child) for child in groups.values()]
+    return q
+
+
+def as_q(lookup):
+    if not isinstance(lookup, RelationLookup):
+        return lookup
+    if len(lookup.lookups) == 1:
+        condition = lookup.lookups[0]
+    else:
+        condition = Q()
+        condition.connector = lookup.connector
+        condition.children = lookup.lookups
+    q = subquery_lookup(lookup.relation, lookup.prefix, condition)
+    return ~q if lookup.negated else q
+
+
+def subquery_lookup(relation, prefix, lookup):
+    """
+    Wraps a lookup through multi-valued relation into a subquery:
+
+    author.groups.name = "foo"
+
+    becomes
+
+    author.pk in (
+        SELECT user.id FROM user JOIN groups ... WHERE groups.name = "foo"
+    )
+
+    so that the outer query doesn't join the relation, and each object gets
+    into results just once. The subquery is selected from the base manager,
+    because joins don't apply any managers too.
+
+    :param relation: first multi-valued RelationField in the path
+    :param prefix: a list of names preceding the relation
+    :param lookup: Q-object for the rest of the path, relative to the model
+        which has the relation
+    """
+    subquery = relation.model._base_manager.filter(lookup).values('pk')
+    return Q(**{'__'.join(prefix + ['pk', 'in']): subquery})
+
+
+def compile_search(search, model, schema=None):
+    """
+    Parses search written in DjangoQL mini-language, validates it vs. schema,
+    optimizes it if schema defines optimizer_passes, and builds a Q-object for
+    it. Returns (ast, Q-object) tuple.
+
+    Results are cached by (schema, model, search) if caching is enabled with
+    cache_queries schema option.
+    """
+    schema = schema or DjangoQLSchema
+    key = (schema, model, search)
+    if schema.cache_queries:
+        compiled = query_cache.get(key)
+        if compiled is not None:
+            return compiled
+    ast = get_parser().parse(search)
+    schema_instance = schema(model)
+    ast = schema_instance.validate(ast)
+    if schema_instance.optimizer_passes:
+        ast = optimize(ast, schema_instance.optimizer_passes)
+    compiled = (ast, build_filter(ast, schema_instance))
+    if schema.cache_queries:
+        query_cache.set(key, compiled)
+    return compiled
+
+
+def invalidate_query_cache(schema=None):
+    """
+    Drops cached queries compiled with given schema, or all cached queries if
+    schema is not specified. Call it when schema definition changes.
+    """
+    if schema is None:
+        query_cache.invalidate()
+    else:
+        query_cache.invalidate(lambda key: key[0] is schema)
+
+
 def apply_search(queryset, search, schema=None):
     """
     Applies search written in DjangoQL mini-language to given queryset
     """
-    ast = DjangoQLParser().parse(search)
-    schema = schema or DjangoQLSchema
-    schema_instance = schema(queryset.model)
-    schema_instance.validate(ast)
-    return queryset.filter(build_filter(ast, schema_instance))
+    ast, q = compile_search(search, queryset.model, schema=schema)
+    return queryset.filter(q)
+
+
+def references_relations(node):
+    """
+    Checks if any comparison in the tree refers to a related model
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node.operator, Logical):
+            stack.extend((node.left, node.right))
+        elif len(node.left.parts) > 1:
+            return True
+    return False
+
+
+def count_searches(queryset, searches, schema=None):
+    """
+    Returns a list with numbers of objects in queryset which match each of
+    given searches, computed in a single query with conditional aggregation.
+    Invalid searches are counted as None. If the query fails in the database,
+    for example because of a value out of range, searches are counted one by
+    one, and the failed ones are counted as None.
+
+    Searches which refer to related models, or to annotations of the
+    queryset, are counted over "pk IN (subquery)" conditions, so that joins
+    don't affect the numbers.
+    """
+    aggregates = {}
+    keys = []
+    counted = queryset
+    if queryset.query.annotations:
+        # Django can't aggregate conditions with subqueries over annotated
+        # querysets, so the same objects are counted without annotations
+        counted = queryset.model._base_manager.filter(
+            pk__in=queryset.values('pk'),
+        )
+    for search in searches:
+        try:
+            ast, q = compile_search(search, queryset.model, schema=schema)
+            if references_relations(ast) or queryset.query.annotations:
+                q = Q(pk__in=queryset.filter(q).values('pk'))
+            # resolves names and values of lookups, without querying
+            counted.filter(q)
+        except (DjangoQLError, ValueError, FieldError, ValidationError):
+            keys.append(None)
+            continue
+        key = 'djangoql_%s' % len(aggregates)
+        aggregates[key] = Count(Case(
+            When(q, then=Value(1)),
+            output_field=IntegerField(),
+        ))
+        keys.append(key)
+    try:
+        counts = _aggregate(counted, aggregates)
+    except (DatabaseError, OverflowError):
+        counts = {}
+        for key, aggregate in aggregates.items():
+            try:
+                counts.update(_aggregate(counted, {key: aggregate}))
+            except (DatabaseError, OverflowError):
+                counts[key] = None
+    return [None if key is None else counts[key] for key in keys]
+
+
+def _aggregate(queryset, aggregates):
+    if not aggregates:
+        return {}
+    # failed query doesn't break the outer transaction
+    with transaction.atomic(using=queryset.db):
+        return queryset.aggregate(**aggregates)
 
 
 class DjangoQLQuerySet(QuerySet):
@@ -45,3 +323,10 @@ class DjangoQLQuerySet(QuerySet):
 
     def djangoql(self, search, schema=None):
         return apply_search(self, search, schema=schema or self.djangoql_schema)
+
+    def djangoql_counts(self, searches, schema=None):
+        return count_searches(
+            self,
+            searches,
+            schema=schema or self.djangoql_schema,
+        )
@@ -1,17 +1,88 @@
+import difflib
 import inspect
+import re
+import threading
 from collections import OrderedDict
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRel
-from django.db import models
-from django.db.models import ManyToManyRel, ManyToOneRel
-
-from .ast import Comparison, Const, List, Logical, Name, Node
-from .compat import text_type
+from django.core.exceptions import FieldError
+from django.core.signals import setting_changed
+from django.db import models, transaction
+from django.db.models import (
+    Count,
+    ManyToManyRel,
+    ManyToOneRel,
+    QuerySet,
+)
+from django.db.models.signals import class_prepared, post_delete, post_save
+from django.utils import timezone
+
+from .ast import Comparison, Const, Expression, List, Logical, Name, Node
+from .cache import LRUCache
+from .compat import Mapping, get_function, string_types, text_type
 from .exceptions import DjangoQLSchemaError
 
 
+# Introspected models and fields, shared by all schema instances with the same
+# configuration, see DjangoQLSchema.introspection_key()
+introspection_cache = LRUCache(
+    maxsize=getattr(settings, 'DJANGOQL_INTROSPECTION_CACHE_SIZE', 256),
+)
+
+
+def invalidate_introspection_cache(**kwargs):
+    """
+    Drops all introspected schemas. It's called automatically when models are
+    created or installed apps change, call it if you change schema
+    definitions at runtime.
+    """
+    introspection_cache.invalidate()
+
+
+class_prepared.connect(invalidate_introspection_cache)
+setting_changed.connect(invalidate_introspection_cache)
+
+
+# Suggestion options of fields, see DjangoQLField.get_cached_options()
+options_cache = LRUCache(
+    maxsize=getattr(settings, 'DJANGOQL_OPTIONS_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'DJANGOQL_OPTIONS_CACHE_TTL', 300),
+)
+# Cache keys include generations of models which options depend on, so saving
+# or deleting an object just bumps a counter, and stale options are evicted
+# by the cache itself.
+options_generations = {}
+# Models which post_save and post_delete signals invalidate cached options
+options_watched_models = set()
+
+
+def invalidate_options_cache(sender=None, **kwargs):
+    """
+    Drops cached suggestion options which depend on given model, or all of
+    them. It's called automatically when objects of such models are saved or
+    deleted, call it after bulk updates.
+    """
+    if sender is None:
+        options_cache.invalidate()
+    else:
+        options_generations[sender] = options_generations.get(sender, 0) + 1
+
+
+def watch_options_models(models):
+    for model in models:
+        if model not in options_watched_models:
+            for signal in (post_save, post_delete):
+                signal.connect(
+                    invalidate_options_cache,
+                    sender=model,
+                    dispatch_uid='djangoql_options',
+                )
+            options_watched_models.add(model)
+
+
 class DjangoQLField(object):
     """
     Abstract searchable field
@@ -19,7 +90,12 @@ class DjangoQLField(object):
     model = None
     name = None
     nullable = False
+    # True, or name of a suggestion strategy, see get_search_options()
     suggest_options = False
+    # Number of most recent rows used by 'sample' suggestion strategy
+    options_sample_size = 10000
+    # Number of most frequent values stored by 'precomputed' strategy
+    options_precomputed_size = 1000
     type = 'unknown'
     value_types = []
     value_types_description = ''
@@ -34,22 +110,209 @@ class DjangoQLField(object):
             self.nullable = nullable
         if suggest_options is not None:
             self.suggest_options = suggest_options
+        strategy = self.options_strategy
+        if strategy and not hasattr(self, 'get_%s_options' % strategy):
+            raise DjangoQLSchemaError(
+                'Unknown suggestion strategy for %s: %s' % (
+                    self.name,
+                    repr(strategy),
+                )
+            )
+
+    @property
+    def options_strategy(self):
+        if isinstance(self.suggest_options, string_types):
+            return self.suggest_options
+        return 'alphabetical' if self.suggest_options else None
 
     def as_dict(self):
+        # Options aren't included, they could be too many. Completion loads
+        # them on demand, see get_search_options().
         return {
             'type': self.type,
             'nullable': self.nullable,
-            'options': list(self.get_options()) if self.suggest_options else [],
+            'options': [],
+            'suggest_options': bool(self.suggest_options),
         }
 
     def get_options(self):
         """
-        Override this method to provide custom suggestion options
+        Override this method to provide custom suggestion options.
+
+        Returns all options, ordered by suggestion strategy. Completion
+        filters them by the search string, override get_search_options()
+        to do that more efficiently.
+        """
+        return self.get_search_options('')
+
+    def get_search_options(self, search):
+        """
+        Override this method to provide custom suggestion options for search.
+
+        Returns distinct values which start with given search string, ordered
+        by suggestion strategy: 'alphabetical' (default), 'frequency',
+        'sample' or 'precomputed'. Result is sliced for pagination, so it
+        should be a queryset or a list.
         """
+        if get_function(type(self).get_options) is not \
+                get_function(DjangoQLField.get_options):
+            # options of fields which override get_options() only
+            return self.filter_options(self.get_options(), search)
+        strategy = self.options_strategy or 'alphabetical'
+        return getattr(self, 'get_%s_options' % strategy)(search)
+
+    def filter_options(self, options, search):
+        """
+        Filters options by search string, in the database if they are a
+        queryset of values of this field
+        """
+        if not search:
+            return options
+        if isinstance(options, QuerySet):
+            try:
+                return options.filter(
+                    **{'%s__istartswith' % self.name: search}
+                )
+            except FieldError:
+                pass
+        search = search.lower()
+        return [
+            option for option in options
+            if text_type(option).lower().startswith(search)
+        ]
+
+    def get_alphabetical_options(self, search):
         return self.model.objects.\
+            filter(**{'%s__istartswith' % self.name: search}).\
             order_by(self.name).\
+            values_list(self.name, flat=True).\
+            distinct()
+
+    def get_frequency_options(self, search):
+        """
+        Most frequent values first, counted with GROUP BY over all rows
+        """
+        return self.model.objects.\
+            filter(**{'%s__istartswith' % self.name: search}).\
+            values(self.name).\
+            annotate(options_count=Count('pk')).\
+            order_by('-options_count', self.name).\
             values_list(self.name, flat=True)
 
+    def get_sample_options(self, search):
+        """
+        Approximation of frequency strategy for very large tables: values are
+        counted over options_sample_size most recent rows only
+        """
+        values = self.model.objects.\
+            filter(**{'%s__istartswith' % self.name: search}).\
+            order_by('-pk').\
+            values_list(self.name, flat=True)[:self.options_sample_size]
+        counts = {}
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        return sorted(counts, key=lambda v: (-counts[v], v))
+
+    def get_precomputed_options(self, search):
+        """
+        Most frequent values stored by refresh_precomputed_options(), see
+        djangoql_refresh_options management command
+        """
+        from django.contrib.contenttypes.models import ContentType
+
+        from .models import SuggestionOption
+
+        return SuggestionOption.objects.\
+            filter(
+                model=ContentType.objects.get_for_model(self.model),
+                field=self.name,
+                value__istartswith=search,
+            ).\
+            order_by('-count', 'value').\
+            values_list('value', flat=True)
+
+    def refresh_precomputed_options(self):
+        """
+        Stores options_precomputed_size most frequent values of the field.
+        Returns number of stored options.
+        """
+        from django.contrib.contenttypes.models import ContentType
+
+        from .models import SuggestionOption
+
+        content_type = ContentType.objects.get_for_model(self.model)
+        rows = self.model.objects.\
+            filter(**{'%s__isnull' % self.name: False}).\
+            values_list(self.name).\
+            annotate(options_count=Count('pk')).\
+            order_by('-options_count', self.name)
+        options = []
+        for value, count in rows.iterator():
+            value = text_type(value)
+            if len(value) > 255:
+                continue
+            options.append(SuggestionOption(
+                model=content_type,
+                field=self.name,
+                value=value,
+                count=count,
+            ))
+            if len(options) >= self.options_precomputed_size:
+                break
+        with transaction.atomic():
+            SuggestionOption.objects.\
+                filter(model=content_type, field=self.name).\
+                delete()
+            SuggestionOption.objects.bulk_create(options)
+        invalidate_options_cache(sender=self.model)
+        return len(options)
+
+    def get_options_cache_key(self, search):
+        """
+        Override this method to customize caching of suggestion options.
+
+        Returns a hashable key which identifies options for given search
+        string, or None to disable caching.
+        """
+        if self.model is None:
+            return None
+        return self.model, self.name, self.suggest_options, search
+
+    def get_options_cache_models(self):
+        """
+        Override this method if custom options depend on other models.
+
+        Returns models which changes invalidate cached options.
+        """
+        return [self.model]
+
+    def get_cached_options(self, search, offset, limit):
+        """
+        Returns a list of up to limit options from get_search_options(),
+        starting at offset. Results are cached until objects of the models
+        they depend on are saved or deleted, but no longer than
+        DJANGOQL_OPTIONS_CACHE_TTL.
+        """
+        key = self.get_options_cache_key(search)
+        if key is None:
+            options = self.get_search_options(search)
+            return list(options[offset:offset + limit])
+        models = tuple(self.get_options_cache_models())
+        watch_options_models(models)
+        key = (
+            type(self),
+            key,
+            offset,
+            limit,
+            tuple(options_generations.get(m, 0) for m in models),
+        )
+        options = options_cache.get(key)
+        if options is None:
+            options = self.get_search_options(search)
+            options = list(options[offset:offset + limit])
+            options_cache.set(key, options)
+        return options
+
     def get_lookup_name(self):
         """
         Override this method to provide custom lookup name
@@ -104,6 +367,13 @@ class DjangoQLField(object):
         return ~q if invert else q
 
     def validate(self, value):
+        """
+        Raises DjangoQLSchemaError if value can't be compared to this field.
+
+        Override this method to convert values for lookups, like parsing dates
+        into date objects: if it returns anything but None, it's used as the
+        value passed to get_lookup() instead of the original one.
+        """
         if not self.nullable and value is None:
             raise DjangoQLSchemaError(
                 'Field %s is not nullable, '
@@ -154,6 +424,12 @@ class BoolField(DjangoQLField):
     value_types_description = 'True or False'
 
 
+date_re = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+datetime_re = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})(?: (\d{2}):(\d{2})(?::(\d{2}))?)?$'
+)
+
+
 class DateField(DjangoQLField):
     type = 'date'
     value_types = [text_type]
@@ -161,8 +437,14 @@ class DateField(DjangoQLField):
 
     def validate(self, value):
         super(DateField, self).validate(value)
+        if value is None:
+            return
         try:
-            datetime.strptime(value, '%Y-%m-%d')
+            match = date_re.match(value)
+            if match:
+                # fast path for canonical format
+                return date(*[int(v) for v in match.groups()])
+            return datetime.strptime(value, '%Y-%m-%d').date()
         except ValueError:
             raise DjangoQLSchemaError(
                 'Field "%s" can be compared to dates in '
@@ -180,13 +462,22 @@ class DateTimeField(DjangoQLField):
 
     def validate(self, value):
         super(DateTimeField, self).validate(value)
-        mask = '%Y-%m-%d'
-        if len(value) > 10:
-            mask += ' %H:%M'
-        if len(value) > 16:
-            mask += ':%S'
+        if value is None:
+            return
         try:
-            datetime.strptime(value, mask)
+            match = datetime_re.match(value)
+            if match:
+                # fast path for canonical format
+                parsed = datetime(
+                    *[int(v) for v in match.groups() if v is not None]
+                )
+            else:
+                mask = '%Y-%m-%d'
+                if len(value) > 10:
+                    mask += ' %H:%M'
+                if len(value) > 16:
+                    mask += ':%S'
+                parsed = datetime.strptime(value, mask)
         except ValueError:
             raise DjangoQLSchemaError(
                 'Field "%s" can be compared to timestamps in '
@@ -195,13 +486,23 @@ class DateTimeField(DjangoQLField):
                     repr(value),
                 )
             )
+        if settings.USE_TZ:
+            # the same as Django does with naive values of DateTimeFields
+            parsed = timezone.make_aware(
+                parsed,
+                timezone.get_default_timezone(),
+            )
+        return parsed
 
 
 class RelationField(DjangoQLField):
     type = 'relation'
+    # True for relations which may point to many objects, like reverse
+    # foreign keys and many-to-many fields
+    multivalued = False
 
     def __init__(self, model, name, related_model, nullable=False,
-                 suggest_options=False):
+                 suggest_options=False, multivalued=None):
         super(RelationField, self).__init__(
             model=model,
             name=name,
@@ -209,6 +510,8 @@ class RelationField(DjangoQLField):
             suggest_options=suggest_options,
         )
         self.related_model = related_model
+        if multivalued is not None:
+            self.multivalued = multivalued
 
     @property
     def relation(self):
@@ -220,10 +523,228 @@ class RelationField(DjangoQLField):
         return dikt
 
 
+class IntrospectedModels(Mapping):
+    """
+    Read-only mapping of model labels to their fields, which introspects
+    models on demand.
+
+    Fields of a model are introspected when the model is accessed for the
+    first time, so resolving a name only touches models along its path.
+    Iterating over the mapping, or accessing a model which wasn't reached
+    yet, walks the whole graph of related models.
+
+    If schema limits introspection with max_depth, max_models or max_fields,
+    models are always introspected breadth-first on first access, so that
+    pruning doesn't depend on the order of access. Pruned models and fields
+    are listed in .pruned.
+    """
+    def __init__(self, schema, model, exclude=()):
+        self.schema = schema
+        self.exclude = exclude
+        self.limited = any(limit is not None for limit in (
+            schema.max_depth,
+            schema.max_models,
+            schema.max_fields,
+        ))
+        # models found so far, in order of discovery, their depth and fields
+        self._models = {schema.model_label(model): model}
+        self._labels = [schema.model_label(model)]
+        self._depth = {schema.model_label(model): 0}
+        self._fields = {}
+        self._pruned_models = set()
+        self._pruned_fields = {}
+        # resolved paths, sorted field names and messages for unknown fields
+        self._paths = {}
+        self._choices = {}
+        self._messages = LRUCache(maxsize=1000)
+        self._lock = threading.RLock()
+
+    def __getitem__(self, label):
+        fields = self._fields.get(label)
+        if fields is not None:
+            return fields
+        with self._lock:
+            if self.limited:
+                self.introspect_all()
+            else:
+                # walk breadth-first only until the model is found
+                i = 0
+                while label not in self._models and i < len(self._labels):
+                    self.introspect(self._labels[i])
+                    i += 1
+            return self.introspect(label)
+
+    def __iter__(self):
+        self.introspect_all()
+        return iter(self._labels)
+
+    def __len__(self):
+        self.introspect_all()
+        return len(self._labels)
+
+    def introspect(self, label):
+        fields = self._fields.get(label)
+        if fields is None:
+            fields = self.schema.introspect_model(self._models[label])
+            pruned = []
+            max_fields = self.schema.max_fields
+            if max_fields is not None and len(fields) > max_fields:
+                pruned.extend(list(fields)[max_fields:])
+                fields = OrderedDict(list(fields.items())[:max_fields])
+            for name, field in list(fields.items()):
+                if not isinstance(field, RelationField) \
+                        or field.relation in self.exclude \
+                        or field.relation in self._models:
+                    continue
+                if self.reachable(label):
+                    self._models[field.relation] = field.related_model
+                    self._labels.append(field.relation)
+                    self._depth[field.relation] = self._depth[label] + 1
+                else:
+                    # relation to a model which won't be introspected
+                    self._pruned_models.add(field.relation)
+                    pruned.append(name)
+                    del fields[name]
+            if pruned:
+                self._pruned_fields[label] = sorted(pruned)
+            self._fields[label] = fields
+        return fields
+
+    def reachable(self, label):
+        """
+        Checks if models related to a given model can be introspected
+        """
+        max_depth = self.schema.max_depth
+        max_models = self.schema.max_models
+        return (max_depth is None or self._depth[label] < max_depth) and \
+            (max_models is None or len(self._labels) < max_models)
+
+    def introspect_all(self):
+        with self._lock:
+            # introspected models may add new ones to the end of the list
+            i = 0
+            while i < len(self._labels):
+                self.introspect(self._labels[i])
+                i += 1
+
+    # Resolved paths are memoized, but there are infinitely many of them in
+    # graphs with cycles, like author.groups.user.groups..., hence the limit
+    max_paths = 10000
+
+    def resolve(self, parts):
+        """
+        Resolves a path, like ('author', 'groups', 'name'), to a tuple of its
+        last field (None if it's a relation) and a tuple of relation fields
+        along the path. Results are memoized.
+        """
+        parts = tuple(parts)
+        resolved = self._paths.get(parts)
+        if resolved is not None:
+            return resolved
+        label = self._labels[0]
+        field = None
+        relations = ()
+        # start with the longest resolved prefix of the path
+        for i in range(len(parts) - 1, 0, -1):
+            prefix = self._paths.get(parts[:i])
+            if prefix is not None and prefix[0] is None:
+                relations = prefix[1]
+                label = relations[-1].relation
+                parts_left = parts[i:]
+                break
+        else:
+            parts_left = parts
+        for name_part in parts_left:
+            field = self[label].get(name_part)
+            if not field:
+                raise DjangoQLSchemaError(
+                    self.unknown_field_message(label, name_part),
+                )
+            if field.type == 'relation':
+                relations += (field,)
+                label = field.relation
+                field = None
+        resolved = (field, relations)
+        if len(self._paths) < self.max_paths:
+            self._paths[parts] = resolved
+        return resolved
+
+    def unknown_field_message(self, label, name):
+        message = self._messages.get((label, name))
+        if message is not None:
+            return message
+        choices = self._choices.get(label)
+        if choices is None:
+            choices = self._choices[label] = sorted(self[label].keys())
+        message = 'Unknown field: %s. Possible choices are: %s' % (
+            name,
+            ', '.join(choices),
+        )
+        suggestions = difflib.get_close_matches(name, choices, n=3)
+        if suggestions:
+            message += '. Did you mean %s?' % ' or '.join(suggestions)
+        self._messages.set((label, name), message)
+        return message
+
+    @property
+    def introspected(self):
+        """
+        Labels of models which fields are introspected already
+        """
+        return [label for label in self._labels if label in self._fields]
+
+    @property
+    def pruned(self):
+        """
+        Models and fields which were excluded by introspection limits, like:
+
+        {
+            'models': ['auth.permission'],
+            'fields': {'auth.group': ['permissions']},
+        }
+        """
+        self.introspect_all()
+        return {
+            'models': sorted(self._pruned_models),
+            'fields': dict(
+                (label, list(names))
+                for label, names in self._pruned_fields.items()
+            ),
+        }
+
+
 class DjangoQLSchema(object):
     include = ()  # models to include into introspection
     exclude = ()  # models to exclude from introspection
+    # Fields with suggestion options: {model: [field names]}, or
+    # {model: {field name: strategy}}, see DjangoQLField.get_search_options()
     suggest_options = None
+    # Cache compiled queries. Enable it only if lookups of your custom fields
+    # depend on query text alone, but not on current time or request.
+    # Disabled by default.
+    cache_queries = False
+    # Optimization passes applied to queries before building filters, see
+    # djangoql.optimizer.DEFAULT_PASSES. Disabled by default.
+    optimizer_passes = ()
+    # Compile conditions on multi-valued relations (reverse foreign keys and
+    # many-to-many fields) into subqueries instead of joins, so that search
+    # results don't contain duplicates and don't need DISTINCT.
+    relation_subqueries = False
+    # How relation subqueries match conditions on the same relation combined
+    # with "and": 'any' checks each condition against any related object,
+    # 'same' requires a single related object to match all of them.
+    relation_match = 'any'
+    # Share introspected models between schema instances. Disable it if
+    # get_fields() or get_field_instance() results change at runtime.
+    cache_introspection = True
+    # Limits for introspection of large model graphs: max number of relations
+    # between current model and introspected ones, max number of introspected
+    # models, and max number of fields per model. Models are introspected
+    # breadth-first, in order of fields returned by get_fields(), and fields
+    # over the limit are dropped from the end. No limits by default.
+    max_depth = None
+    max_models = None
+    max_fields = None
 
     def __init__(self, model):
         if not inspect.isclass(model) or not issubclass(model, models.Model):
@@ -234,6 +755,11 @@ class DjangoQLSchema(object):
             raise DjangoQLSchemaError(
                 'Either include or exclude can be specified, but not both'
             )
+        if self.relation_match not in ('any', 'same'):
+            raise DjangoQLSchemaError(
+                'relation_match must be either "any" or "same", not %s' %
+                repr(self.relation_match)
+            )
         if self.excluded(model):
             raise DjangoQLSchemaError(
                 "%s can't be used with %s because it's excluded from it" % (
@@ -252,38 +778,67 @@ class DjangoQLSchema(object):
 
     @property
     def models(self):
-        if not self._models:
-            self._models = self.introspect(
-                model=self.current_model,
-                exclude=tuple(self.model_label(m) for m in self.exclude),
-            )
+        if self._models is None:
+            key = None
+            if self.cache_introspection:
+                key = self.introspection_key()
+                self._models = introspection_cache.get(key)
+            if self._models is None:
+                self._models = self.introspect(
+                    model=self.current_model,
+                    exclude=tuple(self.model_label(m) for m in self.exclude),
+                )
+                if key is not None:
+                    introspection_cache.set(key, self._models)
         return self._models
 
+    def introspection_key(self):
+        """
+        Introspection results depend on schema class, current model and
+        options which could be changed per instance
+        """
+        return (
+            self.__class__,
+            self.current_model,
+            tuple(self.include),
+            tuple(self.exclude),
+            (self.max_depth, self.max_models, self.max_fields),
+            frozenset(
+                (
+                    model,
+                    tuple(sorted(fields.items()))
+                    if isinstance(fields, Mapping) else tuple(fields),
+                )
+                for model, fields in self.suggest_options.items()
+            ),
+        )
+
     @classmethod
     def model_label(self, model):
         return text_type(model._meta)
 
     def introspect(self, model, exclude=()):
         """
-        Start with given model and recursively walk through its relationships.
+        Start with given model and walk through its relationships.
 
-        Returns a dict with all model labels and their fields found.
+        Returns a mapping with all model labels and their fields found.
+        Models are introspected lazily, on first access, see
+        IntrospectedModels.
+        """
+        return IntrospectedModels(schema=self, model=model, exclude=exclude)
+
+    def introspect_model(self, model):
+        """
+        Returns an ordered dict with fields of a given model
         """
         fields = OrderedDict()
-        result = {self.model_label(model): fields}
         for field in self.get_fields(model):
             if not isinstance(field, DjangoQLField):
                 field = self.get_field_instance(model, field)
             if not field:
                 continue
             fields[field.name] = field
-            if isinstance(field, RelationField) \
-                    and field.relation not in exclude:
-                result.update(self.introspect(
-                    model=field.related_model,
-                    exclude=tuple(exclude) + tuple(result.keys()),
-                ))
-        return result
+        return fields
 
     def get_fields(self, model):
         """
@@ -308,6 +863,9 @@ class DjangoQLSchema(object):
                 return
             field_cls = RelationField
             field_kwargs['related_model'] = field.related_model
+            field_kwargs['multivalued'] = bool(
+                field.one_to_many or field.many_to_many
+            )
         else:
             field_cls = self.get_field_cls(field)
         if isinstance(field, (ManyToOneRel, ManyToManyRel, GenericRel)):
@@ -315,9 +873,11 @@ class DjangoQLSchema(object):
             field_kwargs['nullable'] = True
         else:
             field_kwargs['nullable'] = field.null
-        field_kwargs['suggest_options'] = (
-            field.name in self.suggest_options.get(model, [])
-        )
+        options = self.suggest_options.get(model, [])
+        if isinstance(options, Mapping):
+            field_kwargs['suggest_options'] = options.get(field.name, False)
+        else:
+            field_kwargs['suggest_options'] = field.name in options
         return field_cls(**field_kwargs)
 
     def get_field_cls(self, field):
@@ -338,41 +898,75 @@ class DjangoQLSchema(object):
     def as_dict(self):
         models = {}
         for model_label, fields in self.models.items():
-            models[model_label] = OrderedDict(
-                [(name, field.as_dict()) for name, field in fields.items()]
-            )
-        return {
+            models[model_label] = self.fields_as_dict(fields)
+        result = {
             'current_model': self.model_label(self.current_model),
             'models': models,
         }
+        pruned = getattr(self.models, 'pruned', None)
+        if pruned and (pruned['models'] or pruned['fields']):
+            result['pruned'] = pruned
+        return result
+
+    def model_as_dict(self, label=None):
+        """
+        Returns introspection of a single model, the current one by default,
+        in the same format as as_dict(). Relation fields refer to other models
+        by label, so that they could be loaded on demand. Raises KeyError for
+        models which aren't reachable from the current one.
+        """
+        if label is None:
+            label = self.model_label(self.current_model)
+        return {
+            'current_model': self.model_label(self.current_model),
+            'models': {label: self.fields_as_dict(self.models[label])},
+        }
+
+    def fields_as_dict(self, fields):
+        return OrderedDict(
+            [(name, field.as_dict()) for name, field in fields.items()]
+        )
 
     def resolve_name(self, name):
         assert isinstance(name, Name)
-        model = self.model_label(self.current_model)
-        field = None
-        for name_part in name.parts:
-            field = self.models[model].get(name_part)
-            if not field:
-                raise DjangoQLSchemaError(
-                    'Unknown field: %s. Possible choices are: %s' % (
-                        name_part,
-                        ', '.join(sorted(self.models[model].keys())),
-                    )
-                )
-            if field.type == 'relation':
-                model = field.relation
-                field = None
-        return field
+        return self.models.resolve(name.parts)[0]
+
+    def resolve_path(self, path):
+        """
+        Returns a list of relation fields for given path, like
+        ['author', 'groups']. Path must be valid, see resolve_name().
+        """
+        return list(self.models.resolve(tuple(path))[1])
 
     def validate(self, node):
         """
-        Validate DjangoQL AST tree vs. current schema 
+        Validate DjangoQL AST tree vs. current schema.
+
+        Returns the tree with values converted by fields, like dates parsed
+        into date objects. Unchanged parts of the tree are reused.
         """
         assert isinstance(node, Node)
-        if isinstance(node.operator, Logical):
-            self.validate(node.left)
-            self.validate(node.right)
-            return
+        # Walk the tree with explicit stack instead of recursion, because long
+        # chains of logical expressions can be deeper than recursion limit
+        results = []
+        stack = [(node, False)]
+        while stack:
+            node, visited = stack.pop()
+            if not isinstance(node.operator, Logical):
+                results.append(self.validate_comparison(node))
+            elif not visited:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            else:
+                right = results.pop()
+                left = results.pop()
+                if left is not node.left or right is not node.right:
+                    node = Expression(left, node.operator, right)
+                results.append(node)
+        return results[0]
+
+    def validate_comparison(self, node):
         assert isinstance(node.left, Name)
         assert isinstance(node.operator, Comparison)
         assert isinstance(node.right, (Const, List))
@@ -388,5 +982,14 @@ class DjangoQLSchema(object):
                 )
         else:
             values = value if isinstance(node.right, List) else [value]
+            coerced = []
             for v in values:
-                field.validate(v)
+                c = field.validate(v)
+                coerced.append(v if c is None else c)
+            if any(c is not v for c, v in zip(coerced, values)):
+                if isinstance(node.right, List):
+                    right = List([Const(c) for c in coerced])
+                else:
+                    right = Const(coerced[0])
+                node = Expression(node.left, node.operator, right)
+        return node
@@ -114,6 +114,13 @@
   return {
     currentModel: null,
     models: {},
+    // Fields of related models are loaded from modelIntrospectionsUrl on
+    // demand, if it's set
+    modelIntrospectionsUrl: null,
+    loadingModels: {},
+    suggestionsUrl: null,
+    // Suggestion options loaded from suggestionsUrl, by field and prefix
+    options: {},
 
     token: token,
     lexer: lexer,
@@ -150,6 +157,12 @@
       if (options.valuesCaseSensitive) {
         this.valuesCaseSensitive = true;
       }
+      if (typeof options.suggestionsUrl === 'string') {
+        this.suggestionsUrl = options.suggestionsUrl;
+      }
+      if (typeof options.modelIntrospectionsUrl === 'string') {
+        this.modelIntrospectionsUrl = options.modelIntrospectionsUrl;
+      }
 
       // these handlers are re-used more than once in the code below,
       // so it's handy to have them already bound
@@ -242,6 +255,111 @@
       }
     },
 
+    getModel: function (model) {
+      // Returns fields of the model, or null if they're not loaded yet. In
+      // the latter case they're requested from modelIntrospectionsUrl, and
+      // completion is updated when they're loaded.
+      var request;
+      var onLoadError;
+      if (this.models.hasOwnProperty(model)) {
+        return this.models[model];
+      }
+      if (!model || !this.modelIntrospectionsUrl ||
+          this.loadingModels[model]) {
+        return null;
+      }
+      this.loadingModels[model] = true;
+      onLoadError = function () {
+        delete this.loadingModels[model];
+        this.logError('failed to load introspections from ' +
+            this.modelIntrospectionsUrl);
+      }.bind(this);
+      request = new XMLHttpRequest();
+      request.open('GET', this.modelIntrospectionsUrl + '?model=' +
+          encodeURIComponent(model), true);
+      request.onload = function () {
+        var data;
+        var label;
+        if (request.status === 200) {
+          data = JSON.parse(request.responseText);
+          for (label in data.models) {
+            if (data.models.hasOwnProperty(label)) {
+              this.models[label] = data.models[label];
+            }
+          }
+          delete this.loadingModels[model];
+          if (document.activeElement === this.textarea) {
+            this.popupCompletion();
+          }
+        } else {
+          onLoadError();
+        }
+      }.bind(this);
+      request.ontimeout = onLoadError;
+      request.onerror = onLoadError;
+      request.onprogress = function () {};
+      window.setTimeout(request.send.bind(request));
+      return null;
+    },
+
+    loadOptions: function (model, field, prefix) {
+      // Returns suggestion options for the field which start with prefix,
+      // or null if they're not loaded yet. In the latter case options are
+      // requested from suggestionsUrl, and completion is updated when
+      // they're loaded.
+      var i;
+      var key;
+      var loaded;
+      var request;
+      var onLoadError;
+      var fieldKey = model + '.' + field + ':';
+      var prefixKey = prefix.toLowerCase();
+
+      // Options are searched by prefix. If all options for a shorter prefix
+      // are loaded already, they include all options for this one.
+      for (i = prefixKey.length; i >= 0; i--) {
+        loaded = this.options[fieldKey + prefixKey.slice(0, i)];
+        if (loaded && (i === prefixKey.length || loaded.complete)) {
+          return loaded.items;
+        }
+      }
+      key = fieldKey + prefixKey;
+      if (this.options.hasOwnProperty(key) || !this.suggestionsUrl) {
+        return null;
+      }
+      this.options[key] = null;
+      onLoadError = function () {
+        delete this.options[key];
+        this.logError('failed to load options from ' + this.suggestionsUrl);
+      }.bind(this);
+      request = new XMLHttpRequest();
+      request.open('GET', this.suggestionsUrl + '?' + [
+        'model=' + encodeURIComponent(model),
+        'field=' + encodeURIComponent(field),
+        'search=' + encodeURIComponent(prefix)
+      ].join('&'), true);
+      request.onload = function () {
+        var data;
+        if (request.status === 200) {
+          data = JSON.parse(request.responseText);
+          this.options[key] = {
+            items: data.items,
+            complete: !data.has_next
+          };
+          if (document.activeElement === this.textarea) {
+            this.popupCompletion();
+          }
+        } else {
+          onLoadError();
+        }
+      }.bind(this);
+      request.ontimeout = onLoadError;
+      request.onerror = onLoadError;
+      request.onprogress = function () {};
+      window.setTimeout(request.send.bind(request));
+      return null;
+    },
+
     isObject: function (obj) {
       return (({}).toString.call(obj) === '[object Object]');
     },
@@ -488,13 +606,16 @@
       var f;
       var i;
       var l;
+      var fields;
       var nameParts = name.split('.');
       var model = this.currentModel;
       var field = null;
 
       if (model) {
         for (i = 0, l = nameParts.length; i < l; i++) {
-          f = this.models[model][nameParts[i]];
+          // fields of related models may be not loaded yet
+          fields = this.getModel(model);
+          f = fields && fields[nameParts[i]];
           if (!f) {
             model = null;
             field = null;
@@ -566,10 +687,12 @@
           // use last part as a prefix, analyze preceding parts to get the model
           prefix = nameParts.pop();
           resolvedName = this.resolveName(nameParts.join('.'));
-          if (resolvedName.model && !resolvedName.field) {
+          if (resolvedName.model && !resolvedName.field &&
+              this.getModel(resolvedName.model)) {
             model = resolvedName.model;
           } else {
             // if resolvedName.model is null that means that model wasn't found.
+            // If its fields aren't loaded yet, completion is shown later.
             // if resolvedName.field is NOT null that means that the name
             // preceding current prefix is a concrete field and not a relation,
             // and therefore it can't have any properties.
@@ -610,6 +733,7 @@
       var context;
       var model;
       var field;
+      var options;
       var suggestions;
       var snippetBefore;
       var snippetAfter;
@@ -703,7 +827,12 @@
               }.bind(this);
             }
             this.highlightCaseSensitive = this.valuesCaseSensitive;
-            this.suggestions = field.options.map(function (f) {
+            options = field.options || [];
+            if (field.suggest_options) {
+              options = this.loadOptions(
+                  context.model, context.field, this.prefix) || [];
+            }
+            this.suggestions = options.map(function (f) {
               return suggestion(f, snippetBefore, snippetAfter);
             });
           } else if (field.type === 'bool') {
@@ -1,6 +1,13 @@
 (function (DjangoQL) {
   'use strict';
 
+  // Admin passes URL of static introspections in query string of this script,
+  // see DjangoQLSearchMixin.media. The script is still being executed here,
+  // so if currentScript isn't supported, it's the last one in the document.
+  var scripts = document.getElementsByTagName('script');
+  var script = document.currentScript || scripts[scripts.length - 1];
+  var staticIntrospections = /[?&]introspections=([^&]*)/.exec(script.src);
+
   DjangoQL.DOMReady(function () {
     // Replace standard search input with textarea
     var textarea;
@@ -19,7 +26,13 @@
     textarea.focus();
 
     DjangoQL.init({
-      introspections: 'introspect/',
+      // static introspections include all models
+      introspections: staticIntrospections ?
+          decodeURIComponent(staticIntrospections[1].replace(/\+/g, ' ')) :
+          'introspect-model/',
+      modelIntrospectionsUrl: staticIntrospections ? null :
+          'introspect-model/',
+      suggestionsUrl: 'suggestions/',
       syntaxHelp: 'djangoql-syntax/',
       selector: 'textarea[name=q]',
       autoResize: true
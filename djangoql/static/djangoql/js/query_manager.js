@@ -22,7 +22,7 @@ var DjangoQM = (function() {
       '</div>',
     userQueryTemplate: '' +
       '<div class="djangoql-qm-query" data-id="__id__">' +
-        '<div class="djangoql-qm-text">__text__</div>' +
+        '<div class="djangoql-qm-text">__text____count__</div>' +
         '<div class="djangoql-qm-query-control">' +
             '<span class="djangoql-qm-share noselect __public__" title="Toggle public query">⚑</span>' +
             '<span class="djangoql-qm-delete noselect" title="Delete query"> ✘</span>' +
@@ -30,7 +30,7 @@ var DjangoQM = (function() {
       '</div>',
     publicQueryTemplate: '' +
       '<div class="djangoql-qm-query" data-id="__id__">' +
-          '<div class="djangoql-qm-text">__text__</div>' +
+          '<div class="djangoql-qm-text">__text____count__</div>' +
           '<div class="djangoql-qm-public-tooltip">' +
             'Shared by other user' +
           '</div>' +
@@ -174,9 +174,17 @@ var DjangoQM = (function() {
       });
     },
 
+    countTemplate: '' +
+      '<span class="djangoql-qm-count" title="Matches">__count__</span>',
+
     renderQuery: function (template, query) {
+      var count = '';
+      if (query.count !== undefined && query.count !== null) {
+        count = this.countTemplate.replace(/__count__/g, query.count);
+      }
       return template
         .replace(/__id__/g, query.id)
+        .replace(/__count__/g, count)
         .replace(/__text__/g, query.text)
         .replace(/__public__/g, query.public ? 'public' : '');
     },
@@ -0,0 +1,139 @@
+"""
+Streaming export of search results into CSV or JSON Lines.
+
+Results are fetched in chunks of primary keys, using keyset pagination, so
+memory usage doesn't depend on the number of exported rows, on any database
+backend. Only requested columns are selected.
+"""
+import csv
+from collections import OrderedDict
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .ast import Name
+from .compat import PY2, text_type
+from .queryset import apply_search
+from .schema import DjangoQLSchema, RelationField
+
+
+def get_columns(model, schema=None):
+    """
+    Default columns: all fields of the model except relations
+    """
+    schema_instance = (schema or DjangoQLSchema)(model)
+    fields = schema_instance.models[schema_instance.model_label(model)]
+    return [
+        name for name, field in fields.items()
+        if not isinstance(field, RelationField)
+    ]
+
+
+def get_column_lookups(model, columns, schema=None):
+    """
+    Converts column names, like 'author.email', into lookups for
+    values_list(), like 'author__email'. Raises DjangoQLSchemaError for
+    unknown names.
+    """
+    schema_instance = (schema or DjangoQLSchema)(model)
+    lookups = []
+    for column in columns:
+        parts = column.split('.')
+        field = schema_instance.resolve_name(Name(parts))
+        if field:
+            parts[-1] = field.get_lookup_name()
+        lookups.append('__'.join(parts))
+    return lookups
+
+
+def export_rows(queryset, search=None, columns=None, schema=None,
+                chunk_size=1000):
+    """
+    Yields tuples with values of given columns for objects which match
+    search, ordered by primary key. Columns may refer to fields of related
+    models, like 'author.email', multi-valued relations produce a row per
+    related object.
+
+    Values are selected from the queryset itself, so its annotations could be
+    used as columns too. Columns and search are validated immediately, before
+    rows are fetched.
+    """
+    if columns is None:
+        columns = get_columns(queryset.model, schema)
+    lookups = get_column_lookups(queryset.model, columns, schema)
+    matching = queryset
+    if search:
+        matching = apply_search(queryset, search, schema)
+    return _iter_rows(queryset, matching, lookups, chunk_size)
+
+
+def _iter_rows(queryset, matching, lookups, chunk_size):
+    pks = matching.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        chunk = pks if last is None else pks.filter(pk__gt=last)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            break
+        last = chunk[-1]
+        # rows are selected separately, so that joins made by search don't
+        # duplicate them
+        rows = queryset.filter(pk__in=chunk).order_by('pk').\
+            values_list(*lookups)
+        for row in rows:
+            yield row
+
+
+class Echo(object):
+    """
+    File-like object which returns written values, so that csv.writer
+    could produce lines one by one
+    """
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(Echo())
+    yield _csv_line(writer, columns)
+    for row in rows:
+        yield _csv_line(writer, row)
+
+
+def _csv_line(writer, values):
+    values = ['' if v is None else v for v in values]
+    if PY2:
+        # Python 2 csv module doesn't support unicode
+        values = [text_type(v).encode('utf-8') for v in values]
+        return writer.writerow(values).decode('utf-8')
+    return writer.writerow(values)
+
+
+def jsonl_lines(rows, columns):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(OrderedDict(zip(columns, row))) + '\n'
+
+
+# Export formats: (lines generator, content type, file extension)
+formats = {
+    'csv': (csv_lines, 'text/csv; charset=utf-8', 'csv'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+
+
+def export_lines(queryset, search=None, columns=None, format='csv',
+                 schema=None, chunk_size=1000):
+    """
+    Yields lines of search results exported in given format, 'csv' or
+    'jsonl'
+    """
+    if columns is None:
+        columns = get_columns(queryset.model, schema)
+    rows = export_rows(
+        queryset,
+        search=search,
+        columns=columns,
+        schema=schema,
+        chunk_size=chunk_size,
+    )
+    return formats[format][0](rows, columns)
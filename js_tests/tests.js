@@ -210,6 +210,56 @@ describe('DjangoQL completion', function () {
     });
   });
 
+  describe('.getModel()', function () {
+    it('should return fields of loaded models', function () {
+      expect(DjangoQL.getModel('auth.group')).to
+          .be(DjangoQL.models['auth.group']);
+    });
+    it('should return null if model is not loaded', function () {
+      expect(DjangoQL.getModel('auth.permission')).to.be(null);
+      expect(DjangoQL.getModel(null)).to.be(null);
+    });
+    it('should use models loaded later', function () {
+      var models = DjangoQL.models;
+      DjangoQL.models = {
+        'core.book': models['core.book'],
+        'auth.user': models['auth.user']
+      };
+      expect(DjangoQL.resolveName('author.groups.id')).to
+          .eql({ model: null, field: null });
+      expect(DjangoQL.getContext('author.groups.', 14).scope).to.be(null);
+      DjangoQL.models['auth.group'] = models['auth.group'];
+      expect(DjangoQL.resolveName('author.groups.id')).to
+          .eql({ model: 'auth.group', field: 'id' });
+      expect(DjangoQL.getContext('author.groups.', 14).scope).to.be('field');
+      DjangoQL.models = models;
+    });
+  });
+
+  describe('.loadOptions()', function () {
+    it('should reuse loaded options', function () {
+      DjangoQL.options['auth.group.name:a'] = {
+        items: ['Admins', 'Authors'],
+        complete: true
+      };
+      DjangoQL.options['auth.group.name:e'] = {
+        items: ['Editors'],
+        complete: false
+      };
+      expect(DjangoQL.loadOptions('auth.group', 'name', 'a')).to
+          .eql(['Admins', 'Authors']);
+      expect(DjangoQL.loadOptions('auth.group', 'name', 'Au')).to
+          .eql(['Admins', 'Authors']);
+      expect(DjangoQL.loadOptions('auth.group', 'name', 'e')).to
+          .eql(['Editors']);
+      DjangoQL.options = {};
+    });
+    it('should return null if options are not loaded', function () {
+      expect(DjangoQL.loadOptions('auth.group', 'name', 'ed')).to.be(null);
+      expect(DjangoQL.loadOptions('auth.user', 'email', '')).to.be(null);
+    });
+  });
+
   describe('.getScope()', function () {
     it('should properly detect scope and prefix', function () {
       var book = DjangoQL.currentModel;
@@ -10,7 +10,12 @@ except ImportError:
 
 os.environ['PYTHONDONTWRITEBYTECODE'] = '1'
 
-packages = ['djangoql']
+packages = [
+    'djangoql',
+    'djangoql.management',
+    'djangoql.management.commands',
+    'djangoql.migrations',
+]
 requires = ['ply>=3.8']
 
 setup(
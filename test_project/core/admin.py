@@ -4,7 +4,7 @@ from django.contrib.auth.models import User, Group
 from django.db.models import Q, Count
 from django.utils.timezone import now
 
-from djangoql.admin import DjangoQLSearchMixin
+from djangoql.admin import DjangoQLSearchMixin, export_csv, export_jsonl
 from djangoql.schema import DjangoQLSchema, IntField
 
 from .models import Book
@@ -13,8 +13,17 @@ from .models import Book
 admin.site.unregister(User)
 
 
+class BookQLSchema(DjangoQLSchema):
+    suggest_options = {
+        Book: {'name': 'precomputed'},
+    }
+
+
 @admin.register(Book)
 class BookAdmin(DjangoQLSearchMixin, admin.ModelAdmin):
+    djangoql_schema = BookQLSchema
+    djangoql_export_columns = ['id', 'name', 'author.username']
+    actions = [export_csv, export_jsonl]
     list_display = ('name', 'author', 'written', 'is_published')
     list_filter = ('is_published',)
 
@@ -94,6 +103,7 @@ class UserQLSchema(DjangoQLSchema):
 @admin.register(User)
 class CustomUserAdmin(DjangoQLSearchMixin, UserAdmin):
     djangoql_schema = UserQLSchema
+    djangoql_query_counts = True
 
     list_display = ('username', 'first_name', 'last_name', 'is_staff', 'group')
 
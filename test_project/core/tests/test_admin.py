@@ -1,10 +1,16 @@
+import gzip
+import io
 import json
 
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from djangoql.admin import introspection_responses
 from djangoql.models import Query
 
+from ..models import Book
+
 
 class DjangoQLAdminTest(TestCase):
     def setUp(self):
@@ -25,6 +31,154 @@ class DjangoQLAdminTest(TestCase):
         for model in ('core.book', 'auth.user', 'auth.group'):
             self.assertIn(model, introspections['models'])
 
+    def test_introspection_caching(self):
+        introspection_responses.invalidate()
+        url = reverse('admin:core_book_djangoql_introspect')
+        self.assertTrue(self.client.login(**self.credentials))
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(b'\n', response.content)
+        self.assertNotIn(b', ', response.content)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(1, len(introspection_responses))
+        # unchanged introspection isn't sent again
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+        self.assertEqual(etag, response['ETag'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(200, response.status_code)
+        # compressed for clients which support it
+        content = response.content
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual('gzip', response['Content-Encoding'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            content,
+            gzip.GzipFile(fileobj=io.BytesIO(response.content)).read(),
+        )
+        # with its own ETag
+        gzip_etag = response['ETag']
+        self.assertNotEqual(etag, gzip_etag)
+        response = self.client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(200, response.status_code)
+        response = self.client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=gzip_etag,
+        )
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(gzip_etag, response['ETag'])
+
+    def test_introspection_options(self):
+        # options aren't included into introspection, it's cached even for
+        # schemas with suggestion options
+        introspection_responses.invalidate()
+        url = reverse('admin:auth_user_djangoql_introspect')
+        self.assertTrue(self.client.login(**self.credentials))
+        Group.objects.create(name='new group')
+        response = self.client.get(url)
+        self.assertEqual(1, len(introspection_responses))
+        self.assertNotIn(b'new group', response.content)
+        name = json.loads(response.content.decode('utf8'))['models'][
+            'auth.group'
+        ]['name']
+        self.assertTrue(name['suggest_options'])
+        self.assertEqual([], name['options'])
+
+    def test_introspect_model(self):
+        introspection_responses.invalidate()
+        url = reverse('admin:core_book_djangoql_introspect_model')
+        self.assertTrue(self.client.login(**self.credentials))
+
+        def introspect(**params):
+            response = self.client.get(url, params)
+            self.assertEqual(200, response.status_code)
+            return json.loads(response.content.decode('utf8'))
+
+        introspection = introspect()
+        self.assertEqual('core.book', introspection['current_model'])
+        self.assertEqual(['core.book'], list(introspection['models']))
+        self.assertEqual(
+            ['auth.user'],
+            list(introspect(model='auth.user')['models']),
+        )
+        self.assertEqual(introspection, introspect(model='core.book'))
+        self.assertEqual(2, len(introspection_responses))
+        response = self.client.get(url, {'model': 'core.unknown'})
+        self.assertEqual(400, response.status_code)
+        # responses have their own ETags
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(
+            etag,
+            self.client.get(url, {'model': 'auth.user'})['ETag'],
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
+    def test_suggestions(self):
+        for name in ('Editors', 'Admins', 'authors'):
+            Group.objects.create(name=name)
+        url = reverse('admin:auth_user_djangoql_suggestions')
+        self.assertEqual(302, self.client.get(url).status_code)
+        self.assertTrue(self.client.login(**self.credentials))
+
+        def suggestions(**params):
+            response = self.client.get(url, params)
+            self.assertEqual(200, response.status_code)
+            return json.loads(response.content.decode('utf8'))
+
+        self.assertEqual(
+            {'page': 1, 'items': ['Admins', 'authors'], 'has_next': False},
+            suggestions(model='auth.group', field='name', search='a'),
+        )
+        self.assertEqual(
+            ['Admins', 'Editors', 'authors'],
+            suggestions(model='auth.group', field='name')['items'],
+        )
+        self.assertEqual(
+            [],
+            suggestions(model='auth.group', field='name', search='x')['items'],
+        )
+        for params in (
+            {'model': 'auth.group', 'field': 'id'},  # no suggest_options
+            {'model': 'auth.group', 'field': 'unknown'},
+            {'model': 'core.book', 'field': 'name'},  # excluded
+            {},
+        ):
+            self.assertEqual(400, self.client.get(url, params).status_code)
+
+    def test_suggestions_pages(self):
+        for i in range(60):
+            Group.objects.create(name='group %02d' % i)
+        url = reverse('admin:auth_user_djangoql_suggestions')
+        self.assertTrue(self.client.login(**self.credentials))
+        pages = []
+        for page in (1, 2, 'x'):
+            response = self.client.get(url, {
+                'model': 'auth.group',
+                'field': 'name',
+                'search': 'GROUP',
+                'page': page,
+            })
+            pages.append(json.loads(response.content.decode('utf8')))
+        self.assertEqual(
+            ['group %02d' % i for i in range(50)],
+            pages[0]['items'],
+        )
+        self.assertTrue(pages[0]['has_next'])
+        self.assertEqual(
+            ['group %02d' % i for i in range(50, 60)],
+            pages[1]['items'],
+        )
+        self.assertFalse(pages[1]['has_next'])
+        self.assertEqual(pages[0], pages[2])
+
     def test_save_query(self):
         url = reverse('admin:core_book_djangoql_save_query')
         self.client.login(**self.credentials)
@@ -76,6 +230,33 @@ class DjangoQLAdminTest(TestCase):
         response_json = json.loads(response.content.decode('utf-8'))
         self.assertEqual(len(response_json['results']['user']), 2)
 
+    def test_get_queries_counts(self):
+        url = reverse('admin:auth_user_djangoql_get_queries')
+        self.client.login(**self.credentials)
+        user = User.objects.create(username='user')
+        user.groups.add(Group.objects.create(name='group'))
+        content_type = ContentType.objects.get_for_model(User)
+        for text in ('username ~ "u"', 'groups_count > 0',
+                     'groups.name = "group"', 'invalid query'):
+            Query.objects.create(
+                text=text,
+                model=content_type,
+                user=User.objects.get(username='test'),
+            )
+        response = self.client.get(url)
+        counts = dict(
+            (query['text'], query['count'])
+            for query in json.loads(response.content.decode('utf-8'))[
+                'results'
+            ]['user']
+        )
+        self.assertEqual({
+            'username ~ "u"': 1,
+            'groups_count > 0': 1,
+            'groups.name = "group"': 1,
+            'invalid query': None,
+        }, counts)
+
     def test_get_queries_should_include_public_ones(self):
         get_url = reverse('admin:core_book_djangoql_get_queries')
         update_url = reverse('admin:core_book_djangoql_update_query')
@@ -125,3 +306,40 @@ class DjangoQLAdminTest(TestCase):
     def post_query(self, query):
         post_url = reverse('admin:core_book_djangoql_save_query')
         return self.client.post(post_url, data={'query': query})
+
+    def test_export_actions(self):
+        author = User.objects.get(username='test')
+        books = [
+            Book.objects.create(name='book %s' % i, author=author)
+            for i in range(3)
+        ]
+        url = reverse('admin:core_book_changelist')
+        self.assertTrue(self.client.login(**self.credentials))
+        response = self.client.post(url, {
+            'action': 'export_csv',
+            '_selected_action': [books[0].pk, books[2].pk],
+        })
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            'attachment; filename="book.csv"',
+            response['Content-Disposition'],
+        )
+        self.assertEqual(
+            'id,name,author.username\r\n'
+            '%s,book 0,test\r\n'
+            '%s,book 2,test\r\n' % (books[0].pk, books[2].pk),
+            b''.join(response.streaming_content).decode('utf8'),
+        )
+        response = self.client.post(url + '?q=name+%3D+%22book+1%22', {
+            'action': 'export_jsonl',
+            'select_across': '1',
+            '_selected_action': [books[0].pk],
+        })
+        self.assertEqual(
+            [{'id': books[1].pk, 'name': 'book 1', 'author.username': 'test'}],
+            [
+                json.loads(line.decode('utf8'))
+                for line in response.streaming_content
+            ],
+        )
@@ -1,6 +1,10 @@
+import copy
+import pickle
 from unittest import TestCase
 
-from djangoql.ast import Expression, Name, Comparison, Const
+from djangoql.ast import (
+    Comparison, Const, Expression, List, Logical, Name, flatten,
+)
 
 
 class DjangoQLASTTest(TestCase):
@@ -13,3 +17,76 @@ class DjangoQLASTTest(TestCase):
             Expression(Name('age'), Comparison('='), Const(42)),
             Expression(Name('age'), Comparison('='), Const(18)),
         )
+
+    def test_hash(self):
+        self.assertEqual(
+            hash(Expression(Name('age'), Comparison('='), Const(18))),
+            hash(Expression(Name('age'), Comparison('='), Const(18))),
+        )
+        self.assertEqual(hash(List([Const(1)])), hash(List((Const(1),))))
+        self.assertNotEqual(Logical('='), Comparison('='))
+        nodes = {
+            Name(['book', 'name']): 1,
+            Name('book.name'): 2,
+            Const(['unhashable']): 3,
+        }
+        self.assertEqual(1, nodes[Name(('book', 'name'))])
+        self.assertEqual(3, nodes[Const(['unhashable'])])
+
+    def test_immutable(self):
+        name = Name('age')
+        self.assertRaises(AttributeError, setattr, name, 'parts', ('x',))
+        self.assertRaises(AttributeError, setattr, name, 'other', 1)
+        self.assertRaises(AttributeError, delattr, name, 'parts')
+        self.assertFalse(hasattr(name, '__dict__'))
+        self.assertEqual(('age',), name.parts)
+
+    def test_interned_names(self):
+        self.assertIs(
+            Name([''.join(['na', 'me'])]).parts[0],
+            Name(['name']).parts[0],
+        )
+
+    def test_copy_and_pickle(self):
+        expr = Expression(
+            Name(['author', 'name']),
+            Comparison('in'),
+            List([Const('a'), Const(None)]),
+        )
+        self.assertEqual(expr, copy.deepcopy(expr))
+        self.assertEqual(expr, pickle.loads(pickle.dumps(expr)))
+        self.assertEqual(hash(expr), hash(pickle.loads(pickle.dumps(expr))))
+
+    def test_deep_equality(self):
+        def chain(size):
+            expr = Expression(Name('a'), Comparison('='), Const(0))
+            for i in range(1, size):
+                expr = Expression(
+                    Expression(Name('a'), Comparison('='), Const(i)),
+                    Logical('or'),
+                    expr,
+                )
+            return expr
+        self.assertEqual(chain(5000), chain(5000))
+        self.assertNotEqual(chain(5000), chain(4999))
+
+    def test_flatten(self):
+        a, b, c, d = [
+            Expression(Name(name), Comparison('='), Const(1))
+            for name in 'abcd'
+        ]
+        # a or ((b and c) or d)
+        expr = Expression(
+            a,
+            Logical('or'),
+            Expression(
+                Expression(b, Logical('and'), c),
+                Logical('or'),
+                d,
+            ),
+        )
+        self.assertEqual(
+            [a, Expression(b, Logical('and'), c), d],
+            flatten(expr),
+        )
+        self.assertEqual([b, c], flatten(expr.right.left))
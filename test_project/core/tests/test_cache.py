@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from djangoql.cache import LRUCache
+
+
+class LRUCacheTest(TestCase):
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual('default', cache.get('b', 'default'))
+        self.assertEqual(
+            {'size': 1, 'maxsize': 2, 'hits': 1, 'misses': 2, 'evictions': 0},
+            cache.stats(),
+        )
+
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # now 'b' is the least recently used item
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(1, cache.evictions)
+
+    def test_invalidate(self):
+        cache = LRUCache()
+        for key in ('a1', 'a2', 'b1'):
+            cache.set(key, True)
+        cache.invalidate(lambda key: key.startswith('a'))
+        self.assertEqual(1, len(cache))
+        self.assertIn('b1', cache)
+        cache.invalidate()
+        self.assertEqual(0, len(cache))
+
+    def test_ttl(self):
+        now = [0]
+        cache = LRUCache(ttl=10, timer=lambda: now[0])
+        cache.set('a', 1)
+        now[0] = 5
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        now[0] = 10
+        self.assertNotIn('a', cache)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(2, cache.get('b'))
+        self.assertEqual(1, cache.misses)
+
+    def test_ttl_override(self):
+        now = [0]
+        cache = LRUCache(ttl=10, timer=lambda: now[0])
+        cache.set('a', 1, ttl=20)
+        cache.set('b', 2)
+        now[0] = 15
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
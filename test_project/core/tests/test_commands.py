@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib import admin
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+
+from djangoql.export import MANIFEST, static_introspection_url
+from djangoql.schema import DjangoQLSchema, StrField
+
+from ..admin import BookQLSchema, UserQLSchema
+from ..models import Book
+
+
+class RefreshOptionsTest(TestCase):
+    def test_refresh(self):
+        author = User.objects.create(username='author')
+        for name in ('a', 'b', 'b'):
+            Book.objects.create(name=name, author=author)
+        out = StringIO()
+        call_command('djangoql_refresh_options', stdout=out)
+        self.assertEqual('core.book.name: 2 options\n', out.getvalue())
+        field = StrField(
+            model=Book,
+            name='name',
+            suggest_options='precomputed',
+        )
+        self.assertEqual(['b', 'a'], list(field.get_search_options('')))
+
+    def test_models(self):
+        out = StringIO()
+        call_command('djangoql_refresh_options', 'auth.user', stdout=out)
+        self.assertEqual('', out.getvalue())
+
+
+class ExportSchemaTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command(
+            'djangoql_export_schema',
+            *args,
+            output=self.root,
+            stdout=out
+        )
+        return out.getvalue()
+
+    def manifest(self):
+        with open(os.path.join(self.root, MANIFEST)) as f:
+            return json.load(f)
+
+    def test_admin(self):
+        self.export()
+        manifest = self.manifest()
+        self.assertEqual(
+            ['core.admin.BookQLSchema:core.book',
+             'core.admin.UserQLSchema:auth.user'],
+            sorted(manifest),
+        )
+        path = manifest['core.admin.BookQLSchema:core.book']
+        self.assertTrue(path.startswith('djangoql/introspections/core.book.'))
+        with open(os.path.join(self.root, path)) as f:
+            self.assertEqual(BookQLSchema(Book).as_dict(), json.load(f))
+        # unchanged schemas are exported into the same files
+        self.export()
+        self.assertEqual(manifest, self.manifest())
+        directory = os.path.dirname(os.path.join(self.root, MANIFEST))
+        self.assertEqual(3, len(os.listdir(directory)))  # with manifest
+
+    def test_schemas(self):
+        output = self.export(
+            '--no-admin',
+            'djangoql.schema.DjangoQLSchema:auth.group',
+        )
+        self.assertIn('djangoql.schema.DjangoQLSchema:auth.group', output)
+        self.assertEqual(
+            ['djangoql.schema.DjangoQLSchema:auth.group'],
+            list(self.manifest()),
+        )
+        # exported files are added to the manifest
+        self.export('--no-admin', 'core.admin.UserQLSchema:auth.user')
+        self.assertEqual(2, len(self.manifest()))
+        for invalid in ('DjangoQLSchema', 'djangoql.schema.Unknown:auth.user',
+                        'djangoql.schema.DjangoQLSchema:core.unknown'):
+            with self.assertRaises(CommandError):
+                self.export(invalid)
+
+    def test_static_url(self):
+        with override_settings(STATIC_ROOT=self.root):
+            self.assertIsNone(static_introspection_url(DjangoQLSchema, Group))
+            self.export()
+            url = static_introspection_url(UserQLSchema, User)
+            self.assertTrue(url.startswith('/static/djangoql/introspections/'))
+            self.assertIsNone(static_introspection_url(DjangoQLSchema, Group))
+            model_admin = admin.site._registry[User]
+            self.assertIsNone(model_admin.get_static_introspection_url())
+            self.assertNotIn('introspections=', str(model_admin.media))
+            model_admin.djangoql_introspect_static = True
+            try:
+                self.assertEqual(
+                    url,
+                    model_admin.get_static_introspection_url(),
+                )
+                self.assertIn(
+                    'completion_admin.js?introspections=%2Fstatic%2F',
+                    str(model_admin.media),
+                )
+            finally:
+                del model_admin.djangoql_introspect_static
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        author = User.objects.create(username='author')
+        for name in ('a', 'b', 'c'):
+            Book.objects.create(name=name, author=author)
+
+    def test_export(self):
+        out = StringIO()
+        call_command(
+            'djangoql_export',
+            'core.book',
+            'name != "b"',
+            columns='name,author.username',
+            chunk_size=1,
+            stdout=out,
+        )
+        self.assertEqual(
+            'name,author.username\r\na,author\r\nc,author\r\n',
+            out.getvalue(),
+        )
+
+    def test_output(self):
+        root = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(root, 'books.jsonl')
+            call_command(
+                'djangoql_export',
+                'core.book',
+                columns='name',
+                format='jsonl',
+                output=filename,
+            )
+            with open(filename) as f:
+                self.assertEqual(
+                    [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}],
+                    [json.loads(line) for line in f],
+                )
+        finally:
+            shutil.rmtree(root)
+
+    def test_invalid(self):
+        for args in (('core.unknown',), ('core.book', 'unknown = 1')):
+            with self.assertRaises(CommandError):
+                call_command('djangoql_export', *args, stdout=StringIO())
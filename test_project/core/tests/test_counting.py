@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+
+from djangoql.admin import DjangoQLSearchMixin
+from djangoql.counting import (
+    CappedCount,
+    CountingPaginator,
+    cached_count,
+    capped_count,
+    count_cache,
+    exact_count,
+)
+
+from ..models import Book
+
+
+class CountingTest(TestCase):
+    def setUp(self):
+        count_cache.invalidate()
+        User.objects.bulk_create([
+            User(username='user%s' % i) for i in range(5)
+        ])
+
+    def test_capped_count(self):
+        self.assertEqual(5, capped_count(User.objects.all(), 5))
+        count = capped_count(User.objects.all(), 3)
+        self.assertIsInstance(count, CappedCount)
+        self.assertEqual(3, count)
+        self.assertEqual('3+', str(count))
+
+    def test_exact_count(self):
+        self.assertEqual(5, exact_count(User.objects.all(), timeout=10))
+
+    def test_exact_count_timeout(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Timeouts are tested on SQLite only')
+        # counting to a million takes much longer than the timeout
+        queryset = User.objects.extra(where=[
+            '(WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c '
+            'WHERE x < 1000000) SELECT COUNT(*) FROM c) > 0',
+        ])
+        count = exact_count(queryset, timeout=0.001, cap=2)
+        self.assertIsInstance(count, CappedCount)
+        self.assertEqual(2, count)
+        # connection still works
+        self.assertEqual(5, User.objects.count())
+
+    def test_timeout_is_reset(self):
+        # tests run inside a transaction, like with ATOMIC_REQUESTS
+        self.assertEqual(5, exact_count(User.objects.all(), timeout=0.01))
+        time.sleep(0.02)
+        queryset = User.objects.extra(where=[
+            '(WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c '
+            'WHERE x < 100000) SELECT COUNT(*) FROM c) > 0',
+        ])
+        self.assertEqual(5, queryset.count())
+
+    def test_cached_count(self):
+        queryset = User.objects.filter(username__startswith='user')
+        with self.assertNumQueries(1):
+            self.assertEqual(5, cached_count(queryset, 60))
+            self.assertEqual(5, cached_count(queryset.all(), 60))
+        with self.assertNumQueries(1):
+            cached_count(User.objects.filter(username__startswith='u'), 60)
+        with self.assertNumQueries(0):
+            self.assertEqual(0, cached_count(User.objects.none(), 60))
+
+    def test_paginator(self):
+        paginator = CountingPaginator(
+            User.objects.order_by('pk'),
+            2,
+            count=lambda queryset: capped_count(queryset, 3),
+        )
+        self.assertEqual('3+', str(paginator.count))
+        self.assertEqual(2, paginator.num_pages)
+
+    def test_admin_strategies(self):
+        model_admin = DjangoQLSearchMixin()
+        model_admin.djangoql_count_cap = 3
+        queryset = User.objects.all()
+        self.assertEqual(5, model_admin.get_djangoql_count(queryset))
+        model_admin.djangoql_count_strategy = 'capped'
+        self.assertEqual('3+', str(model_admin.get_djangoql_count(queryset)))
+        model_admin.djangoql_count_strategy = 'cached'
+        self.assertEqual(5, model_admin.get_djangoql_count(queryset))
+        with self.assertNumQueries(0):
+            model_admin.get_djangoql_count(queryset)
+        model_admin.djangoql_count_strategy = 'approximate'
+        with self.assertRaises(ImproperlyConfigured):
+            model_admin.get_paginator(None, queryset, 2)
+
+    def test_admin_invalid_search(self):
+        credentials = {'username': 'test', 'password': 'lol'}
+        User.objects.create_superuser(email='herp@derp.rr', **credentials)
+        self.assertTrue(self.client.login(**credentials))
+        model_admin = admin.site._registry[Book]
+        model_admin.djangoql_count_strategy = 'cached'
+        try:
+            response = self.client.get(
+                reverse('admin:core_book_changelist'),
+                {'q': 'nosuchfield = 1'},
+            )
+        finally:
+            del model_admin.djangoql_count_strategy
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'nosuchfield')
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest import TestCase as UnitTestCase
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from django.utils.timezone import now
+
+from djangoql.evaluator import compile_predicate, filter_objects
+from djangoql.exceptions import DjangoQLError, DjangoQLSchemaError
+
+from ..models import Book
+
+
+EVENTS = [
+    {'id': 1, 'type': 'click', 'user': {'name': 'Alice', 'tags': ['a', 'b']}},
+    {'id': 2, 'type': 'view', 'user': {'name': 'Bob', 'tags': []}},
+    {'id': 3, 'type': 'Click', 'user': None, 'value': 1.5},
+    {'id': 4, 'type': None, 'user': {'groups': [{'name': 'x'}]}},
+]
+
+
+class DictPredicateTest(UnitTestCase):
+    def ids(self, search):
+        return [e['id'] for e in filter_objects(EVENTS, search)]
+
+    def test_comparisons(self):
+        self.assertEqual([1], self.ids('type = "click"'))
+        self.assertEqual([2, 3, 4], self.ids('type != "click"'))
+        self.assertEqual([4], self.ids('type = None'))
+        self.assertEqual([1, 2, 3], self.ids('type != None'))
+        self.assertEqual([3, 4], self.ids('id > 2'))
+        self.assertEqual([3], self.ids('value >= 1'))
+        self.assertEqual([1, 2, 4], self.ids('value != 1.5'))
+
+    def test_contains(self):
+        self.assertEqual([1, 3], self.ids('type ~ "LICK"'))
+        self.assertEqual([2, 4], self.ids('type !~ "lick"'))
+
+    def test_in(self):
+        self.assertEqual([1, 2], self.ids('type in ("click", "view")'))
+        self.assertEqual([3, 4], self.ids('type not in ("click", "view")'))
+        self.assertEqual([], self.ids('type in (None)'))
+
+    def test_logical(self):
+        self.assertEqual(
+            [1, 3],
+            self.ids('id = 1 or (id > 2 and type ~ "click")'),
+        )
+        search = ' or '.join(['id = %s' % i for i in range(3000)])
+        self.assertEqual([1, 2, 3, 4], self.ids(search))
+
+    def test_paths(self):
+        self.assertEqual([2], self.ids('user.name = "Bob"'))
+        self.assertEqual([3, 4], self.ids('user.name = None'))
+        self.assertEqual([1], self.ids('user.tags = "b"'))
+        self.assertEqual([2, 3, 4], self.ids('user.tags != "b"'))
+        self.assertEqual([2, 3, 4], self.ids('user.tags = None'))
+        self.assertEqual([4], self.ids('user.groups.name in ("x", "y")'))
+
+    def test_list_values(self):
+        events = [{'id': 1, 'tags': ['a', 'b']}, {'id': 2, 'tags': []}]
+        for search, expected in (
+            ('tags = "a"', [1]),
+            ('tags != "a"', [2]),
+            ('tags in ("b", "c")', [1]),
+            ('tags not in ("b", "c")', [2]),
+            ('tags = None', [2]),
+        ):
+            found = filter_objects(events, search)
+            self.assertEqual(expected, [e['id'] for e in found], search)
+
+    def test_incomparable_values(self):
+        events = [
+            {'id': 1, 'x': '5'},
+            {'id': 2, 'x': 5},
+            {'id': 3, 'x': {'y': 1}},
+        ]
+        for search, expected in (
+            ('x > 1', [2]),
+            ('x > 1 or id = 1', [1, 2]),
+            ('x in (1, 5)', [2]),
+            ('x not in (1, 5)', [1, 3]),
+            ('x.y > 0', [3]),
+            ('x.y >= "a" or id = 2', [2]),
+        ):
+            found = filter_objects(events, search)
+            self.assertEqual(expected, [e['id'] for e in found], search)
+
+    def test_long_search(self):
+        search = ' or '.join(
+            ['user.name = "%s" or id = %s' % (i, i) for i in range(2000)],
+        )
+        predicate = compile_predicate(search)
+        self.assertEqual([1, 2, 3, 4], self.ids(search))
+        # one function for all comparisons of the path, and the safe version
+        # isn't compiled until it's needed
+        self.assertIn('def p0(', predicate.source)
+        self.assertNotIn('def p1(', predicate.source)
+        self.assertNotIn('safe_compare(', predicate.source)
+        self.assertLess(len(predicate.source), 200 * 4000)
+
+    def test_errors(self):
+        with self.assertRaises(DjangoQLError):
+            filter_objects(EVENTS, 'type = "click" and')
+        with self.assertRaises(ValueError):
+            compile_predicate('id = 1', access='index')
+
+    def test_source(self):
+        predicate = compile_predicate('id = 1 and user.name ~ "a"')
+        self.assertIn("obj.get('id')", predicate.source)
+        self.assertIs(
+            predicate,
+            compile_predicate('id = 1 and user.name ~ "a"'),
+        )
+
+
+class ModelPredicateTest(TestCase):
+    def setUp(self):
+        group = Group.objects.create(name='Writers')
+        self.author = User.objects.create(username='author')
+        self.author.groups.add(group)
+        other = User.objects.create(username='other')
+        for i in range(6):
+            Book.objects.create(
+                name='Book %s' % i,
+                author=self.author if i % 2 else other,
+                written=now() - timedelta(days=i),
+                rating=i if i % 3 else None,
+                price=Decimal(i) if i % 4 else None,
+            )
+
+    def test_same_as_database(self):
+        day = (now() - timedelta(days=2)).strftime('%Y-%m-%d %H:%M')
+        books = list(Book.objects.select_related('author'))
+        for search in (
+            'name ~ "book 1" or rating > 2',
+            'rating = None or price <= 2.5',
+            'rating != 1 and price not in (1, 3)',
+            'author.username = "author" and is_published = False',
+            'author.groups.name = "Writers"',
+            'author.groups.name != "Writers"',
+            'author.groups = None',
+            'written < "%s"' % day,
+        ):
+            expected = list(
+                Book.objects.djangoql(search).distinct().order_by('pk'),
+            )
+            found = filter_objects(books, search, Book)
+            self.assertEqual(
+                expected,
+                sorted(found, key=lambda book: book.pk),
+                search,
+            )
+
+    def test_reverse_relation(self):
+        predicate = compile_predicate('book.name = "Book 1"', User)
+        self.assertTrue(predicate(self.author))
+        self.assertFalse(predicate(User.objects.get(username='other')))
+
+    def test_validation(self):
+        with self.assertRaises(DjangoQLSchemaError):
+            compile_predicate('rating = "high"', Book)
+
+    def test_dicts(self):
+        predicate = compile_predicate(
+            'written > "2017-01-01" and author.username = "x"',
+            Book,
+            access='item',
+        )
+        book = {'written': now(), 'author': {'username': 'x'}}
+        self.assertTrue(predicate(book))
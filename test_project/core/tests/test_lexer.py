@@ -1,7 +1,8 @@
+import random
 from decimal import Decimal
 from unittest import TestCase
 
-from djangoql.lexer import DjangoQLLexer
+from djangoql.lexer import DjangoQLFastLexer, DjangoQLLexer
 from djangoql.exceptions import DjangoQLLexerError
 
 
@@ -93,3 +94,62 @@ class DjangoQLLexerTest(TestCase):
         for i, t in enumerate(self.lexer.input('1\n  3\n    5\n')):
             self.assertEqual(i + 1, t.lineno)
             self.assertEqual(i * 2 + 1, self.lexer.find_column(t))
+
+
+class DjangoQLFastLexerTest(DjangoQLLexerTest):
+    lexer = DjangoQLFastLexer()
+
+
+class LexersParityTest(TestCase):
+    ply = DjangoQLLexer()
+    fast = DjangoQLFastLexer()
+
+    def tokenize(self, lexer, text):
+        result = []
+        try:
+            for t in lexer.input(text):
+                result.append((
+                    t.type,
+                    t.value,
+                    t.lineno,
+                    t.lexpos,
+                    lexer.find_column(t),
+                ))
+        except DjangoQLLexerError as e:
+            result.append((str(e), e.value, e.line, e.column))
+        return result
+
+    def assert_same(self, text):
+        self.assertEqual(
+            self.tokenize(self.ply, text),
+            self.tokenize(self.fast, text),
+            'Lexers disagree on %r' % text,
+        )
+
+    def test_samples(self):
+        samples = (
+            '',
+            '   ',
+            'a.b.c != "x\\"y" and d ~ "\\u0041" or not in (1, -2.5e3)',
+            'or.x',
+            'True.False',
+            'order and_ inx None1',
+            '01 -0 -1.5 2E+3 3e 1.',
+            '"unterminated',
+            'a = 1\n\r\n  b\u2028c\u2029 d\t\v\f\u00a0e',
+            'a ^ b',
+            'a..b',
+            '!',
+            '-',
+            '!==~!~<=>=<>',
+        )
+        for text in samples:
+            self.assert_same(text)
+
+    def test_random_input(self):
+        alphabet = 'aZ_09.,()=!<>~"\\- \n\tuTrueFalseNoneornotandin^'
+        rnd = random.Random(42)
+        for _ in range(3000):
+            self.assert_same(''.join(
+                rnd.choice(alphabet) for _ in range(rnd.randint(1, 20))
+            ))
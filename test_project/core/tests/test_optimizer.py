@@ -0,0 +1,143 @@
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+
+from djangoql.optimizer import DEFAULT_PASSES, optimize
+from djangoql.parser import DjangoQLParser
+from djangoql.queryset import apply_search
+from djangoql.schema import DjangoQLSchema
+
+from ..models import Book
+
+
+class OptimizedSchema(DjangoQLSchema):
+    optimizer_passes = DEFAULT_PASSES
+
+
+class DjangoQLOptimizerTest(TestCase):
+    parser = DjangoQLParser()
+
+    def assert_optimized(self, query, expected):
+        self.assertEqual(
+            self.parser.parse(expected),
+            optimize(self.parser.parse(query)),
+        )
+
+    def test_fold_in(self):
+        self.assert_optimized('a = 1 or a = 2 or a = 3', 'a in (1, 2, 3)')
+        self.assert_optimized(
+            'a = 1 or b = "x" or a in (2, 1) or b = "y"',
+            'a in (1, 2) or b in ("x", "y")',
+        )
+        self.assert_optimized(
+            'a != 1 and a not in (2, 3) and b = 1',
+            'a not in (1, 2, 3) and b = 1',
+        )
+        # None can't be used in IN lists
+        self.assert_optimized('a = None or a = 1', 'a = None or a = 1')
+        self.assert_optimized('a = 1 and b = 2 or c = 3',
+                              'a = 1 and b = 2 or c = 3')
+
+    def test_merge_ranges(self):
+        self.assert_optimized('x > 5 and x > 7', 'x > 7')
+        self.assert_optimized('x > 5 or x > 7', 'x > 5')
+        self.assert_optimized('x >= 7 and x > 7 and x < 9', 'x > 7 and x < 9')
+        self.assert_optimized('x <= 3 or x < 3.5 or y > 1', 'x < 3.5 or y > 1')
+        # strings are compared by DB collation rules, so they're not merged
+        self.assert_optimized('x > "a" and x > "b"', 'x > "a" and x > "b"')
+
+    def test_remove_duplicates(self):
+        self.assert_optimized(
+            'a = 1 and (b = 2 or c = 3) and a = 1',
+            'a = 1 and (b = 2 or c = 3)',
+        )
+        self.assert_optimized('a.b ~ "x" or a.b ~ "x"', 'a.b ~ "x"')
+
+    def test_constants(self):
+        self.assert_optimized('(x > 7 and x < 3) or y = 1', 'y = 1')
+        self.assert_optimized('(x = 1 and x = 2) or y = 1', 'y = 1')
+        self.assert_optimized(
+            '(x = None or x != None) and y = 1',
+            'y = 1',
+        )
+        self.assert_optimized(
+            'y = 1 and ((x = None and x != None) or z = 2)',
+            'y = 1 and z = 2',
+        )
+        # conditions on multi-valued relations may be satisfied by different
+        # related objects, so it's not a contradiction
+        self.assert_optimized(
+            'x.y = 1 and x.y = 2',
+            'x.y = 1 and x.y = 2',
+        )
+        # the whole query can't be replaced with a constant
+        self.assert_optimized('x > 7 and x < 3', 'x > 7 and x < 3')
+
+    def test_custom_passes(self):
+        ast = self.parser.parse('a = 1 or a = 2 or a = 1')
+        self.assertEqual(
+            self.parser.parse('a = 1 or a = 2'),
+            optimize(ast, passes=[DEFAULT_PASSES[0]]),
+        )
+        self.assertEqual(ast, optimize(ast, passes=[]))
+
+    def test_long_chain(self):
+        ast = self.parser.parse(
+            ' or '.join('id = %s' % i for i in range(3000)),
+        )
+        self.assertEqual(list(range(3000)), optimize(ast).right.value)
+
+
+class OptimizerEquivalenceTest(TestCase):
+    queries = [
+        'id = 1 or id = 2 or id = 3',
+        'id = 1 or id = 2 or id in (3, 4) or name = "b2"',
+        'id != 1 and id != 2 and id not in (3)',
+        'rating > 1 and rating > 2.5',
+        'rating > 1 or rating >= 4 or price < 10',
+        'rating >= 2 and rating > 2 and rating <= 4',
+        '(rating > 4 and rating < 1) or is_published = True',
+        '(price = None or price != None) and author.username = "u1"',
+        'price = None and price != None or name ~ "b"',
+        'author.groups.name = "g1" or author.groups.name = "g2"',
+        'author.groups.name != "g1" and author.groups.name != "g2"',
+        'author.groups.id > 0 and author.groups.id > 1',
+        'name = "b1" and name = "b1" or name = "b3"',
+        'id = 1 and id = 2 or id = 3',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        groups = [Group.objects.create(name='g%s' % i) for i in range(3)]
+        for i in range(4):
+            user = User.objects.create(username='u%s' % i)
+            user.groups.add(*groups[:i])
+        for i, user in enumerate(User.objects.all()):
+            for j in range(3):
+                Book.objects.create(
+                    name='b%s' % (i * 3 + j),
+                    author=user,
+                    is_published=bool(j % 2),
+                    rating=j * 1.5 if j else None,
+                    price=i * 5 + j if i else None,
+                )
+
+    def search(self, query, schema):
+        return sorted(
+            apply_search(Book.objects.all(), query, schema).
+            values_list('id', flat=True)
+        )
+
+    def test_same_results(self):
+        for query in self.queries:
+            self.assertEqual(
+                self.search(query, DjangoQLSchema),
+                self.search(query, OptimizedSchema),
+                query,
+            )
+
+    def test_smaller_sql(self):
+        query = ' or '.join('id = %s' % i for i in range(50))
+        plain = apply_search(Book.objects.all(), query, DjangoQLSchema)
+        optimized = apply_search(Book.objects.all(), query, OptimizedSchema)
+        self.assertLess(len(str(optimized.query)), len(str(plain.query)) / 3)
+        self.assertIn(' IN (', str(optimized.query))
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
+import random
+import threading
 import unittest.util
 from unittest import TestCase
 
 from djangoql.ast import Expression, Name, Comparison, Logical, Const, List
 from djangoql.exceptions import DjangoQLParserError
-from djangoql.parser import DjangoQLParser
+from djangoql.lexer import DjangoQLFastLexer
+from djangoql.parser import DjangoQLParser, get_parser
 
 
 # Show full contents in assertions when comparing long text strings
@@ -100,3 +103,134 @@ class DjangoQLParseTest(TestCase):
                        Const(5)),
             self.parser.parse('user.group.id = 5'),
         )
+
+
+class DjangoQLDescentParseTest(DjangoQLParseTest):
+    parser = DjangoQLParser(engine='descent')
+
+
+class DjangoQLFastLexerParseTest(DjangoQLParseTest):
+    parser = DjangoQLParser(engine='descent', lexer=DjangoQLFastLexer())
+
+
+class DjangoQLFastLexerPlyParseTest(DjangoQLParseTest):
+    parser = DjangoQLParser(engine='ply', lexer=DjangoQLFastLexer())
+
+
+class ParserEnginesParityTest(TestCase):
+    ply = DjangoQLParser(engine='ply')
+    descent = DjangoQLParser(engine='descent')
+
+    samples = [
+        'a = 1',
+        'a.b.c != "x" and d ~ "y" or e !~ "z"',
+        'a > 1.5e3 or (b < -2 and (c >= 0.5 or d <= "q")) and e = None',
+        'a in (1, 2.5, "x", None, True, False) and b not in ("y")',
+        '((a = True)) or ((b = False and c = None))',
+        'a = "\\u0041\\"quoted\\"" and b = ""',
+        '',
+        '(',
+        ')',
+        'a',
+        'a =',
+        'a = 1 and',
+        'a = 1 and or b = 2',
+        'a = 1 b = 2',
+        '(a = 1',
+        'a = 1)',
+        '(a = 1))',
+        '()',
+        'a = (1)',
+        'a in 1',
+        'a in ()',
+        'a in (1,)',
+        'a in (1 2)',
+        'a not 1',
+        'a not in',
+        'a ~ 1',
+        'a > True',
+        'a = b',
+        '1 = a',
+        'a = 1\n and\n b = 2 c',
+        'a = "very long string value which is cut in error message" b',
+        'a = 1 or\n\n  True',
+        'a = 1 and b = 2 or c = 3 and d = 4',
+    ]
+
+    def parse(self, parser, text):
+        try:
+            return parser.parse(text)
+        except DjangoQLParserError as e:
+            return (str(e), e.value, e.line, e.column)
+
+    def assert_same(self, text):
+        self.assertEqual(
+            self.parse(self.ply, text),
+            self.parse(self.descent, text),
+            'Engines disagree on %r' % text,
+        )
+
+    def test_samples(self):
+        for text in self.samples:
+            self.assert_same(text)
+
+    def test_random_token_sequences(self):
+        vocabulary = [
+            'a', 'b.c', '=', '!=', '>', '>=', '<', '<=', '~', '!~', 'in',
+            'not', 'and', 'or', '(', ')', ',', '1', '2.5', '"s"', 'True',
+            'False', 'None', '\n',
+        ]
+        rnd = random.Random(42)
+        for _ in range(3000):
+            length = rnd.randint(1, 12)
+            self.assert_same(
+                ' '.join(rnd.choice(vocabulary) for _ in range(length)),
+            )
+
+    def test_valid_random_queries(self):
+        rnd = random.Random(42)
+        comparisons = [
+            'a = 1', 'b.c != "x"', 'd in (1, 2)', 'e not in ("y")',
+            'f ~ "z"', 'g >= 1.5', 'h = None',
+        ]
+        for _ in range(500):
+            parts = []
+            for i in range(rnd.randint(1, 10)):
+                if i:
+                    parts.append(rnd.choice(['and', 'or']))
+                comparison = rnd.choice(comparisons)
+                if rnd.random() < 0.3:
+                    comparison = '(%s)' % comparison
+                parts.append(comparison)
+            text = ' '.join(parts)
+            self.assertIsInstance(self.parse(self.descent, text), Expression)
+            self.assert_same(text)
+
+    def test_long_chain(self):
+        text = ' or '.join('id = %s' % i for i in range(10000))
+        expression = self.descent.parse(text)
+        self.assertEqual(Const(0), expression.left.right)
+        self.assertEqual(Logical('or'), expression.operator)
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, DjangoQLParser, engine='lol')
+
+
+class SharedParserTest(TestCase):
+    def test_reused_within_thread(self):
+        parser = get_parser()
+        self.assertIsInstance(parser, DjangoQLParser)
+        self.assertIs(parser, get_parser())
+        self.assertIsInstance(parser.default_lexer, DjangoQLFastLexer)
+        self.assertEqual(
+            Expression(Name('age'), Comparison('>='), Const(18)),
+            parser.parse('age >= 18'),
+        )
+
+    def test_not_shared_between_threads(self):
+        parsers = []
+        thread = threading.Thread(target=lambda: parsers.append(get_parser()))
+        thread.start()
+        thread.join()
+        self.assertEqual(1, len(parsers))
+        self.assertIsNot(get_parser(), parsers[0])
@@ -1,7 +1,21 @@
-from django.contrib.auth.models import User
+import warnings
+from datetime import datetime
+
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Count
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from djangoql.queryset import apply_search
+from djangoql.queryset import (
+    apply_search,
+    compile_search,
+    count_searches,
+    invalidate_query_cache,
+    query_cache,
+)
 from djangoql.schema import DjangoQLSchema, IntField
 
 from ..models import Book
@@ -23,6 +37,34 @@ class BookCustomSearchSchema(DjangoQLSchema):
             ]
 
 
+class NoCacheSchema(DjangoQLSchema):
+    cache_queries = False
+
+
+class CacheSchema(DjangoQLSchema):
+    cache_queries = True
+
+
+class CacheBookCustomSearchSchema(BookCustomSearchSchema):
+    cache_queries = True
+
+
+class SubquerySchema(DjangoQLSchema):
+    relation_subqueries = True
+
+
+class SameRowSubquerySchema(SubquerySchema):
+    relation_match = 'same'
+
+
+class GroupsCountSchema(DjangoQLSchema):
+    def get_fields(self, model):
+        fields = super(GroupsCountSchema, self).get_fields(model)
+        if model == User:
+            fields = [IntField(name='groups_count')] + fields
+        return fields
+
+
 class DjangoQLQuerySetTest(TestCase):
     def test_simple_query(self):
         qs = Book.objects.djangoql('name = "foo" and author.email = "bar@baz"')
@@ -49,3 +91,311 @@ class DjangoQLQuerySetTest(TestCase):
         self.assertTrue(
             where_clause.startswith('"core_book"."written" BETWEEN 2017-01-01')
         )
+
+    def test_dates(self):
+        author = User.objects.create(username='ann')
+        for day in (1, 2, 3):
+            Book.objects.create(
+                name='book%s' % day,
+                author=author,
+                written=datetime(2017, 1, day, 12, 0, tzinfo=timezone.utc),
+            )
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            qs = Book.objects.djangoql(
+                'written in ("2017-01-01 12:00", "2017-01-03 12:00") or '
+                'written > "2017-01-03"',
+                schema=NoCacheSchema,
+            )
+            self.assertEqual(
+                ['book1', 'book3'],
+                sorted(qs.values_list('name', flat=True)),
+            )
+        # values are timezone-aware, Django doesn't warn about naive ones
+        self.assertEqual([], [str(w.message) for w in caught])
+
+    def test_long_logical_chains(self):
+        # Long chains of terms used to hit recursion limit in validation and
+        # filter building, and produced deeply nested Q-objects
+        for query in (
+            ' or '.join('id = %s' % i for i in range(3000)),
+            ' and '.join('id != %s' % i for i in range(3000)),
+            ' or '.join('(id = %s and name = "%s")' % (i, i)
+                        for i in range(2000)),
+        ):
+            qs = Book.objects.djangoql(query, schema=NoCacheSchema)
+            str(qs.query)
+        # Alternating operators are nested by nature, Django itself can't
+        # compile such deep Q-objects, but we should be able to build them
+        ast, q = compile_search(
+            ' or '.join('id = %s and name = "%s"' % (i, i)
+                        for i in range(2000)),
+            Book,
+            schema=NoCacheSchema,
+        )
+        self.assertEqual(2, len(q.children))
+
+    def test_flat_filter(self):
+        qs = Book.objects.djangoql(
+            'id = 1 or (id = 2 or id = 3) or id = 4 and (id = 5 and id = 6)',
+        )
+        where_clause = str(qs.query).split('WHERE')[1].strip()
+        self.assertEqual(
+            '("core_book"."id" = 1 OR "core_book"."id" = 2 OR '
+            '"core_book"."id" = 3 OR ("core_book"."id" = 4 AND '
+            '"core_book"."id" = 5 AND "core_book"."id" = 6))',
+            where_clause,
+        )
+
+
+class QueryCacheTest(TestCase):
+    def setUp(self):
+        invalidate_query_cache()
+
+    def test_cached(self):
+        search = 'name = "foo" and author.email = "bar@baz"'
+        hits = query_cache.hits
+        ast, q = compile_search(search, Book, CacheSchema)
+        self.assertEqual(hits, query_cache.hits)
+        cached_ast, cached_q = compile_search(search, Book, CacheSchema)
+        self.assertEqual(hits + 1, query_cache.hits)
+        self.assertIs(ast, cached_ast)
+        self.assertIs(q, cached_q)
+        self.assertEqual(
+            str(Book.objects.filter(q).query),
+            str(Book.objects.djangoql(search, schema=CacheSchema).query),
+        )
+        # models have separate cache entries, non-caching schemas add none
+        compile_search(search, Book)
+        compile_search('email = "bar@baz"', User, schema=CacheSchema)
+        compile_search('email = "bar@baz"', User)
+        self.assertEqual(2, len(query_cache))
+
+    def test_invalidate(self):
+        compile_search('name = "foo"', Book, CacheSchema)
+        compile_search(
+            'written_in_year = 2017',
+            Book,
+            CacheBookCustomSearchSchema,
+        )
+        invalidate_query_cache(CacheBookCustomSearchSchema)
+        self.assertEqual(1, len(query_cache))
+        self.assertIn((CacheSchema, Book, 'name = "foo"'), query_cache)
+
+    def test_disabled(self):
+        compile_search('name = "foo"', Book)
+        compile_search('name = "foo"', Book, schema=NoCacheSchema)
+        self.assertEqual(0, len(query_cache))
+
+
+class RelationSubqueriesTest(TestCase):
+    def setUp(self):
+        groups = [Group.objects.create(name=name) for name in 'abc']
+        for i, name in enumerate(('ann', 'bob', 'cid')):
+            user = User.objects.create(username=name)
+            user.groups.add(*groups[:i + 1])
+            for j in range(3):
+                Book.objects.create(name='%s%s' % (name, j), author=user)
+
+    def assertSameResults(self, model, search):
+        expected = model.objects.filter(
+            compile_search(search, model)[1],
+        ).distinct().order_by('pk')
+        qs = apply_search(model.objects.all(), search, SubquerySchema)
+        self.assertEqual(list(expected), list(qs.order_by('pk')))
+        return qs
+
+    def test_no_duplicates(self):
+        qs = self.assertSameResults(User, 'groups.name in ("a", "b")')
+        self.assertEqual(3, qs.count())
+        qs = self.assertSameResults(User, 'book.name ~ "b"')
+        self.assertEqual(1, qs.count())
+        self.assertNotIn('JOIN', str(qs.query).split('WHERE')[0])
+        self.assertEqual(
+            3,
+            apply_search(User.objects.all(), 'book.name ~ "b"').count(),
+        )
+
+    def test_nested_relations(self):
+        for search in (
+            'author.groups.name = "c" or name = "ann0"',
+            'author.book.name = "bob1" and author.groups.name ~ "a"',
+            'author.book.author.groups.name != "b"',
+            'author.groups = None',
+        ):
+            self.assertSameResults(Book, search)
+        qs = apply_search(
+            Book.objects.all(),
+            'author.groups.name = "c" and author.username = "cid"',
+            SubquerySchema,
+        )
+        self.assertEqual(3, qs.count())
+        self.assertIn('"core_book"."author_id" IN (SELECT', str(qs.query))
+
+    def test_coalesced_subqueries(self):
+        for search in (
+            'groups.name = "a" or username = "ann" or groups.name = "c"',
+            'groups.name != "a" and groups.name != "c"',
+        ):
+            qs = self.assertSameResults(User, search)
+            # the query itself and one subquery
+            self.assertEqual(2, str(qs.query).count('SELECT'))
+        qs = self.assertSameResults(
+            User,
+            '(groups.name = "b" or book.name = "ann1" or groups.name = "c")'
+            ' and (book.name = "x" or book.name ~ "i")',
+        )
+        self.assertEqual(4, str(qs.query).count('SELECT'))
+        qs = apply_search(
+            User.objects.all(),
+            'groups.name = "a" and groups.name = "c"',
+            SubquerySchema,
+        )
+        self.assertEqual(3, str(qs.query).count('SELECT'))
+
+    def test_relation_match(self):
+        search = 'groups.name = "a" and groups.name = "c"'
+        qs = apply_search(User.objects.all(), search, SubquerySchema)
+        self.assertEqual(['cid'], [u.username for u in qs])
+        qs = apply_search(User.objects.all(), search, SameRowSubquerySchema)
+        self.assertEqual([], list(qs))
+        self.assertEqual(2, str(qs.query).count('SELECT'))
+        # same related object semantics is the same as with joins
+        search = 'book.name ~ "1" and book.name ~ "b"'
+        self.assertEqual(
+            list(apply_search(
+                User.objects.all(), search,
+            ).distinct().order_by('pk')),
+            list(apply_search(
+                User.objects.all(), search, SameRowSubquerySchema,
+            ).order_by('pk')),
+        )
+
+    def test_single_valued_relations(self):
+        search = 'author.username = "ann" and content_type = None'
+        self.assertEqual(
+            str(Book.objects.djangoql(search).query),
+            str(Book.objects.djangoql(search, schema=SubquerySchema).query),
+        )
+
+
+class NegatedRelationSubqueriesTest(TestCase):
+    def setUp(self):
+        groups = [Group.objects.create(name=name) for name in 'abc']
+        content_types = [
+            None,
+            ContentType.objects.get_for_model(Book),
+            ContentType.objects.get_for_model(Group),
+        ]
+        for i, name in enumerate(('ann', 'bob', 'cid', 'dan')):
+            user = User.objects.create(username=name)
+            user.groups.add(*groups[:i])
+            for j in range(i):
+                Book.objects.create(
+                    name='%s%s' % (name, j),
+                    author=user,
+                    rating=[None, 1, 2][j],
+                    content_type=content_types[j],
+                )
+
+    def test_same_results(self):
+        # Users without books or groups, nullable fields and nullable
+        # relations before multi-valued ones are all covered by the data
+        for model, search in (
+            (User, 'book.rating != None'),
+            (User, 'book.rating != 1'),
+            (User, 'book.rating not in (1, 2)'),
+            (User, 'book.name !~ "n"'),
+            (User, 'groups.name != "a"'),
+            (User, 'groups != None'),
+            (User, 'groups.name not in ("a", "b")'),
+            (User, 'groups.name != "a" or book.rating != 2'),
+            (Book, 'author.book.rating != 1'),
+            (Book, 'author.groups.name != "b"'),
+            (Book, 'content_type.permission.codename != "add_book"'),
+            (Book, 'content_type.permission.codename !~ "book"'),
+            (Book, 'content_type.permission != None'),
+        ):
+            expected = model.objects.filter(
+                compile_search(search, model)[1],
+            ).distinct().order_by('pk')
+            qs = apply_search(model.objects.all(), search, SubquerySchema)
+            self.assertEqual(
+                list(expected),
+                list(qs.order_by('pk')),
+                '%s: %s' % (model.__name__, search),
+            )
+
+    def test_anti_join(self):
+        qs = apply_search(
+            Book.objects.all(),
+            'author.groups.name != "b"',
+            SubquerySchema,
+        )
+        where_clause = str(qs.query).split('WHERE', 1)[1].strip()
+        self.assertTrue(
+            where_clause.startswith('NOT ("core_book"."author_id" IN (SELECT')
+        )
+        self.assertEqual(1, where_clause.count('SELECT'))
+
+
+class CountSearchesTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author')
+        self.author.groups.add(*[
+            Group.objects.create(name=name) for name in ('a', 'b')
+        ])
+        for i in range(5):
+            Book.objects.create(name='book %s' % i, author=self.author)
+
+    def test_counts(self):
+        searches = [
+            'name ~ "book"',
+            'name = "book 1" or name = "book 3"',
+            'author.groups.name in ("a", "b")',
+            'author.groups.name != "a"',
+            'unknown = 1',
+            'name ~ "book"',
+        ]
+        with CaptureQueriesContext(connection) as context:
+            counts = count_searches(Book.objects.all(), searches)
+        queries = [
+            query for query in context.captured_queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(1, len(queries))
+        self.assertEqual([5, 2, 5, 0, None, 5], counts)
+        for search, count in zip(searches[:4], counts):
+            self.assertEqual(
+                apply_search(Book.objects.all(), search).distinct().count(),
+                count,
+            )
+
+    def test_failed_searches(self):
+        searches = [
+            'name ~ "book"',
+            'id = 99999999999999999999',
+            'unknown = 1',
+            'author = 1',
+        ]
+        self.assertEqual(
+            [5, None, None, None],
+            count_searches(Book.objects.all(), searches),
+        )
+
+    def test_annotations(self):
+        qs = User.objects.annotate(groups_count=Count('groups'))
+        self.assertEqual(
+            [1, 0],
+            count_searches(qs, ['groups_count > 1', 'groups_count = 0'],
+                           schema=GroupsCountSchema),
+        )
+
+    def test_queryset(self):
+        self.assertEqual(
+            [1, 0],
+            Book.objects.filter(name='book 1').djangoql_counts(
+                ['name ~ "book"', 'name = "book 2"'],
+            ),
+        )
+        self.assertEqual([], count_searches(Book.objects.all(), []))
@@ -1,10 +1,24 @@
+from datetime import date, datetime
+
 from django.apps import apps
 from django.contrib.auth.models import Group, User
+from django.db.models.signals import class_prepared
 from django.test import TestCase
+from django.utils import timezone
 
+from djangoql.ast import Name
 from djangoql.exceptions import DjangoQLSchemaError
 from djangoql.parser import DjangoQLParser
-from djangoql.schema import DjangoQLSchema, IntField
+from djangoql.schema import (
+    DateField,
+    DjangoQLSchema,
+    IntField,
+    StrField,
+    introspection_cache,
+    invalidate_introspection_cache,
+    invalidate_options_cache,
+    options_cache,
+)
 
 from ..models import Book
 
@@ -45,6 +59,10 @@ class BookCustomSearchSchema(DjangoQLSchema):
             ]
 
 
+class NoIntrospectionCacheSchema(DjangoQLSchema):
+    cache_introspection = False
+
+
 class DjangoQLSchemaTest(TestCase):
     def all_models(self):
         models = []
@@ -98,6 +116,54 @@ class DjangoQLSchemaTest(TestCase):
         ])
         self.assertListEqual(list(custom.keys()), ['name', 'is_published'])
 
+    def test_multivalued_relations(self):
+        schema = DjangoQLSchema(Book)
+        author, groups = schema.resolve_path(['author', 'groups'])
+        self.assertFalse(author.multivalued)
+        self.assertTrue(groups.multivalued)
+        self.assertTrue(schema.models['auth.user']['book'].multivalued)
+        self.assertTrue(schema.models['auth.group']['user'].multivalued)
+
+    def test_get_options(self):
+        author = User.objects.create(username='author')
+        for name in ('Book', 'book', 'book', 'Other'):
+            Book.objects.create(name=name, author=author)
+        field = DjangoQLSchema(Book).models['core.book']['name']
+        self.assertEqual(
+            ['Book', 'book'],
+            sorted(field.get_search_options('bo')),
+        )
+        self.assertEqual(3, len(field.get_search_options('')))
+        self.assertEqual(3, len(field.get_options()))
+
+    def test_legacy_get_options(self):
+        author = User.objects.create(username='author')
+        for name in ('Book', 'Other', 'book'):
+            Book.objects.create(name=name, author=author)
+
+        class ReversedNameField(StrField):
+            model = Book
+            name = 'name'
+            suggest_options = True
+
+            def get_options(self):
+                return Book.objects.order_by('-name').\
+                    values_list('name', flat=True)
+
+        class ListField(ReversedNameField):
+            def get_options(self):
+                return ['Book', 'Other', 'book']
+
+        self.assertEqual(
+            ['book', 'Book'],
+            list(ReversedNameField().get_search_options('bo')),
+        )
+        self.assertEqual(['Book', 'book'], ListField().get_search_options('B'))
+        self.assertEqual(
+            ['Book', 'Other', 'book'],
+            ListField().get_cached_options('', 0, 10),
+        )
+
     def test_custom_search(self):
         custom = BookCustomSearchSchema(Book).as_dict()['models']['core.book']
         self.assertListEqual(list(custom.keys()), ['written_in_year'])
@@ -113,6 +179,13 @@ class DjangoQLSchemaTest(TestCase):
             self.fail('Schema was initialized with a model excluded from it')
         except DjangoQLSchemaError:
             pass
+        try:
+            type(str('InvalidMatchSchema'), (DjangoQLSchema,), {
+                'relation_match': 'all',
+            })(Book)
+            self.fail('Invalid relation_match raises no error')
+        except DjangoQLSchemaError:
+            pass
         try:
             IncludeUserGroupSchema(User())
             self.fail('Schema was initialized with an instance of a model')
@@ -143,7 +216,7 @@ class DjangoQLSchemaTest(TestCase):
             'groups.gav > 1',               # unknown related field
             'groups = "lol"',               # can't compare model to a value
             'groups.name != 1',             # bad value type
-            'is_staff = True and gav < 2',  # complex expression with valid part
+            'is_staff = True and gav < 2',  # expression with valid part
             'date_joined < "1753-30-01"',   # bad timestamps
             'date_joined < "1753-01-01 12"',
             'date_joined < "1753-01-01 12AM"',
@@ -155,3 +228,388 @@ class DjangoQLSchemaTest(TestCase):
                 self.fail('This query should\'t pass validation: %s' % query)
             except DjangoQLSchemaError as e:
                 pass
+
+    def test_validation_long_chains(self):
+        schema = IncludeUserGroupSchema(User)
+        for operators in (['or'], ['and', 'or']):
+            query = ' '.join(
+                'id = %s %s' % (i, operators[i % len(operators)])
+                for i in range(10000)
+            ) + ' is_staff = True'
+            schema.validate(DjangoQLParser(engine='descent').parse(query))
+        query = ' or '.join(['id = 1'] * 5000 + ['gav = 1'])
+        self.assertRaises(
+            DjangoQLSchemaError,
+            schema.validate,
+            DjangoQLParser(engine='descent').parse(query),
+        )
+
+
+class LimitedSchema(NoIntrospectionCacheSchema):
+    max_depth = 1
+    max_models = 3
+    max_fields = 6
+
+
+class IntrospectionLimitsTest(TestCase):
+    def schema(self, model, **limits):
+        return type(str('Schema'), (NoIntrospectionCacheSchema,), limits)(
+            model,
+        )
+
+    def test_max_depth(self):
+        schema = self.schema(User, max_depth=0)
+        self.assertEqual(['auth.user'], list(schema.models))
+        self.assertNotIn('groups', schema.models['auth.user'])
+        self.assertIn('username', schema.models['auth.user'])
+        pruned = schema.as_dict()['pruned']
+        self.assertIn('auth.group', pruned['models'])
+        self.assertEqual(
+            ['book', 'groups', 'logentry', 'query', 'user_permissions'],
+            pruned['fields']['auth.user'],
+        )
+        schema = self.schema(Book, max_depth=1)
+        self.assertEqual(
+            ['core.book', 'auth.user', 'contenttypes.contenttype'],
+            list(schema.models),
+        )
+
+    def test_max_models(self):
+        schema = self.schema(Book, max_models=2)
+        self.assertEqual(['core.book', 'auth.user'], list(schema.models))
+        self.assertEqual(
+            ['content_type'],
+            schema.models.pruned['fields']['core.book'],
+        )
+        self.assertRaises(
+            DjangoQLSchemaError,
+            schema.resolve_name,
+            Name(['content_type', 'model']),
+        )
+        self.assertEqual('email', schema.resolve_name(
+            Name(['author', 'email']),
+        ).name)
+
+    def test_max_fields(self):
+        schema = self.schema(Book, max_fields=3)
+        self.assertEqual(
+            ['author', 'content_type', 'id'],
+            list(schema.models['core.book']),
+        )
+        self.assertEqual(
+            ['is_published', 'name', 'object_id', 'price', 'rating',
+             'written'],
+            schema.models.pruned['fields']['core.book'],
+        )
+
+    def test_deterministic(self):
+        # Pruning doesn't depend on the order in which models are accessed
+        expected = LimitedSchema(Book).as_dict()
+        schema = LimitedSchema(Book)
+        try:
+            schema.resolve_name(Name(['content_type', 'model']))
+        except DjangoQLSchemaError:
+            pass
+        self.assertEqual(expected, schema.as_dict())
+        self.assertEqual(expected, LimitedSchema(Book).as_dict())
+        self.assertNotIn('pruned', DjangoQLSchema(Book).as_dict())
+
+
+class ValueCoercionTest(TestCase):
+    def validate(self, query, model=Book):
+        return DjangoQLSchema(model).validate(DjangoQLParser().parse(query))
+
+    def test_dates(self):
+        utc = timezone.utc
+        ast = self.validate('written > "2017-01-02 03:04"')
+        self.assertEqual(
+            datetime(2017, 1, 2, 3, 4, tzinfo=utc),
+            ast.right.value,
+        )
+        ast = self.validate(
+            'written in ("2017-01-02", "2017-1-3 10:20:30") or name = "x"',
+        )
+        self.assertEqual(
+            [datetime(2017, 1, 2, tzinfo=utc),
+             datetime(2017, 1, 3, 10, 20, 30, tzinfo=utc)],
+            ast.left.right.value,
+        )
+        self.assertEqual(
+            date(2017, 1, 2),
+            DateField(name='day').validate('2017-01-02'),
+        )
+        self.assertEqual(
+            date(2017, 1, 3),
+            DateField(name='day').validate('2017-1-3'),
+        )
+        self.assertIsNone(self.validate('last_login = None', User).right.value)
+        for value in ('2017-13-01', '2017-01-02 25:00', '2017.01.02'):
+            self.assertRaises(
+                DjangoQLSchemaError,
+                self.validate,
+                'written = "%s"' % value,
+            )
+
+    def test_unchanged(self):
+        ast = DjangoQLParser().parse(
+            'name = "x" and (id > 1 or author = None)',
+        )
+        self.assertIs(ast, DjangoQLSchema(Book).validate(ast))
+        ast = DjangoQLParser().parse('name = "x" and written < "2017-01-01"')
+        validated = DjangoQLSchema(Book).validate(ast)
+        self.assertIs(ast.left, validated.left)
+        self.assertIsNot(ast.right, validated.right)
+
+
+class LazyIntrospectionTest(TestCase):
+    def test_resolve_name(self):
+        schema = NoIntrospectionCacheSchema(Book)
+        field = schema.resolve_name(Name(['author', 'groups', 'name']))
+        self.assertEqual('name', field.name)
+        self.assertEqual(
+            ['core.book', 'auth.user', 'auth.group'],
+            schema.models.introspected,
+        )
+
+    def test_validate(self):
+        schema = NoIntrospectionCacheSchema(Book)
+        schema.validate(
+            DjangoQLParser().parse('name = "foo" and author.email = "bar"'),
+        )
+        self.assertEqual(
+            ['core.book', 'auth.user'],
+            schema.models.introspected,
+        )
+
+    def test_model_as_dict(self):
+        schema = NoIntrospectionCacheSchema(Book)
+        introspection = schema.model_as_dict()
+        self.assertEqual('core.book', introspection['current_model'])
+        self.assertEqual(['core.book'], list(introspection['models']))
+        self.assertEqual(
+            'auth.user',
+            introspection['models']['core.book']['author']['relation'],
+        )
+        self.assertEqual(['core.book'], schema.models.introspected)
+        introspection = schema.model_as_dict('auth.group')
+        self.assertEqual('core.book', introspection['current_model'])
+        self.assertIn('name', introspection['models']['auth.group'])
+        self.assertEqual(
+            ['core.book', 'auth.user', 'auth.group'],
+            schema.models.introspected,
+        )
+        with self.assertRaises(KeyError):
+            schema.model_as_dict('core.unknown')
+
+    def test_full_graph(self):
+        schema = NoIntrospectionCacheSchema(Book)
+        self.assertIn('auth.permission', schema.models)
+        self.assertEqual(len(schema.models), len(schema.models.introspected))
+        self.assertEqual(
+            sorted(schema.models),
+            sorted(NoIntrospectionCacheSchema(Book).as_dict()['models']),
+        )
+
+
+class NameResolutionTest(TestCase):
+    def test_resolve(self):
+        models = NoIntrospectionCacheSchema(Book).models
+        resolved = models.resolve(('author', 'groups', 'name'))
+        self.assertIs(resolved, models.resolve(['author', 'groups', 'name']))
+        field, relations = resolved
+        self.assertEqual('name', field.name)
+        self.assertEqual(
+            ['author', 'groups'],
+            [relation.name for relation in relations],
+        )
+        self.assertEqual(relations, models.resolve(('author', 'groups'))[1])
+        self.assertIsNone(models.resolve(('author', 'groups'))[0])
+        field, relations = models.resolve(
+            ('author', 'groups', 'permissions', 'codename'),
+        )
+        self.assertEqual('codename', field.name)
+        self.assertEqual(3, len(relations))
+
+    def test_suggestions(self):
+        schema = NoIntrospectionCacheSchema(Book)
+        try:
+            schema.resolve_name(Name(['author', 'emial']))
+            self.fail('Unknown field was resolved')
+        except DjangoQLSchemaError as e:
+            message = str(e)
+        self.assertTrue(message.startswith(
+            'Unknown field: emial. Possible choices are: book, date_joined, '
+        ))
+        self.assertTrue(message.endswith('. Did you mean email?'))
+        try:
+            schema.resolve_name(Name(['xyz']))
+            self.fail('Unknown field was resolved')
+        except DjangoQLSchemaError as e:
+            self.assertNotIn('Did you mean', str(e))
+
+
+class IntrospectionCacheTest(TestCase):
+    def setUp(self):
+        invalidate_introspection_cache()
+
+    def test_shared(self):
+        models = DjangoQLSchema(Book).models
+        self.assertIs(models, DjangoQLSchema(Book).models)
+        self.assertIsNot(models, DjangoQLSchema(User).models)
+        self.assertIsNot(models, ExcludeUserSchema(Book).models)
+        self.assertEqual(3, len(introspection_cache))
+
+    def test_options(self):
+        schema = DjangoQLSchema(Book)
+        schema.suggest_options = {Book: ['name']}
+        models = schema.models
+        self.assertTrue(models['core.book']['name'].suggest_options)
+        self.assertFalse(
+            DjangoQLSchema(Book).models['core.book']['name'].suggest_options
+        )
+        schema = DjangoQLSchema(Book)
+        schema.suggest_options = {Book: ('name',)}
+        self.assertIs(models, schema.models)
+
+    def test_disabled(self):
+        models = NoIntrospectionCacheSchema(Book).models
+        self.assertIsNot(models, NoIntrospectionCacheSchema(Book).models)
+        self.assertEqual(0, len(introspection_cache))
+
+    def test_invalidate(self):
+        models = DjangoQLSchema(Book).models
+        # sent when models are created
+        class_prepared.send(sender=Book)
+        self.assertEqual(0, len(introspection_cache))
+        self.assertIsNot(models, DjangoQLSchema(Book).models)
+
+
+class AuthorNameField(StrField):
+    model = Book
+    name = 'author_name'
+    suggest_options = True
+
+    def get_search_options(self, search):
+        return User.objects.\
+            filter(username__istartswith=search).\
+            order_by('username').\
+            values_list('username', flat=True)
+
+    def get_options_cache_models(self):
+        return [User]
+
+
+class UncachedNameField(StrField):
+    model = Book
+    name = 'name'
+
+    def get_options_cache_key(self, search):
+        return None
+
+
+class OptionsCacheTest(TestCase):
+    def setUp(self):
+        invalidate_options_cache()
+        self.author = User.objects.create(username='author')
+        self.book = Book.objects.create(name='Book', author=self.author)
+
+    def test_cached(self):
+        field = DjangoQLSchema(Book).models['core.book']['name']
+        self.assertEqual(['Book'], field.get_cached_options('b', 0, 10))
+        with self.assertNumQueries(0):
+            self.assertEqual(['Book'], field.get_cached_options('b', 0, 10))
+        with self.assertNumQueries(1):
+            self.assertEqual([], field.get_cached_options('b', 1, 10))
+        self.assertEqual(2, len(options_cache))
+
+    def test_invalidated_on_save(self):
+        field = DjangoQLSchema(Book).models['core.book']['name']
+        field.get_cached_options('', 0, 10)
+        Book.objects.create(name='Another', author=self.author)
+        self.assertEqual(
+            ['Another', 'Book'],
+            field.get_cached_options('', 0, 10),
+        )
+        self.book.delete()
+        self.assertEqual(['Another'], field.get_cached_options('', 0, 10))
+
+    def test_custom_models(self):
+        field = AuthorNameField()
+        self.assertEqual(['author'], field.get_cached_options('', 0, 10))
+        # saving books doesn't affect these options
+        Book.objects.create(name='Another', author=self.author)
+        with self.assertNumQueries(0):
+            field.get_cached_options('', 0, 10)
+        User.objects.create(username='another')
+        self.assertEqual(
+            ['another', 'author'],
+            field.get_cached_options('', 0, 10),
+        )
+
+    def test_disabled(self):
+        field = UncachedNameField()
+        self.assertEqual(['Book'], field.get_cached_options('', 0, 10))
+        with self.assertNumQueries(1):
+            field.get_cached_options('', 0, 10)
+        self.assertEqual(0, len(options_cache))
+
+
+class SuggestionStrategiesTest(TestCase):
+    def setUp(self):
+        author = User.objects.create(username='author')
+        for name in ('a', 'b', 'b', 'c', 'c', 'c', 'B'):
+            Book.objects.create(name=name, author=author)
+
+    def field(self, strategy, **kwargs):
+        field = StrField(
+            model=Book,
+            name='name',
+            suggest_options=strategy,
+        )
+        for key, value in kwargs.items():
+            setattr(field, key, value)
+        return field
+
+    def test_alphabetical(self):
+        self.assertEqual(
+            ['B', 'a', 'b', 'c'],
+            list(self.field(True).get_search_options('')),
+        )
+
+    def test_frequency(self):
+        field = self.field('frequency')
+        self.assertEqual(
+            ['c', 'b', 'B', 'a'],
+            list(field.get_search_options('')),
+        )
+        self.assertEqual(['b', 'B'], list(field.get_search_options('b')))
+        self.assertEqual(['c', 'b'], list(field.get_search_options('')[:2]))
+
+    def test_sample(self):
+        field = self.field('sample', options_sample_size=5)
+        # only 5 most recent rows are counted
+        self.assertEqual(['c', 'B', 'b'], field.get_search_options(''))
+        self.assertEqual(['b', 'B'], field.get_search_options('b'))
+
+    def test_precomputed(self):
+        field = self.field('precomputed', options_precomputed_size=3)
+        self.assertEqual([], list(field.get_search_options('')))
+        self.assertEqual(3, field.refresh_precomputed_options())
+        self.assertEqual(['c', 'b', 'B'], list(field.get_search_options('')))
+        self.assertEqual(['b', 'B'], list(field.get_search_options('b')))
+        Book.objects.filter(name='c').delete()
+        self.assertEqual(3, field.refresh_precomputed_options())
+        self.assertEqual(['b', 'B', 'a'], list(field.get_search_options('')))
+
+    def test_schema_options(self):
+        schema = DjangoQLSchema(Book)
+        schema.suggest_options = {Book: {'name': 'frequency'}}
+        fields = schema.models['core.book']
+        self.assertEqual('frequency', fields['name'].suggest_options)
+        self.assertTrue(fields['name'].as_dict()['suggest_options'])
+        self.assertFalse(fields['id'].suggest_options)
+        self.assertIsNot(fields, DjangoQLSchema(Book).models['core.book'])
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(DjangoQLSchemaError):
+            self.field('popular')
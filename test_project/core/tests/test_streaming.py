@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+
+from djangoql.exceptions import DjangoQLSchemaError
+from djangoql.streaming import (
+    export_lines,
+    export_rows,
+    get_column_lookups,
+    get_columns,
+)
+
+from ..models import Book
+
+
+class StreamingExportTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='a@b.c')
+        self.books = [
+            Book.objects.create(
+                name='book %s' % i,
+                author=self.author,
+                price=Decimal('1.50') if i == 1 else None,
+            )
+            for i in range(5)
+        ]
+
+    def test_columns(self):
+        columns = get_columns(Book)
+        self.assertIn('name', columns)
+        self.assertNotIn('author', columns)
+        self.assertEqual(
+            ['name', 'author__email', 'author'],
+            get_column_lookups(Book, ['name', 'author.email', 'author']),
+        )
+
+    def test_chunks(self):
+        qs = Book.objects.all()
+        # two queries per chunk, and one more to find out there's no more
+        with self.assertNumQueries(7):
+            rows = list(export_rows(qs, columns=['id'], chunk_size=2))
+        self.assertEqual([(b.pk,) for b in self.books], rows)
+
+    def test_search(self):
+        rows = export_rows(
+            Book.objects.all(),
+            search='name in ("book 1", "book 3")',
+            columns=['name', 'author.username'],
+        )
+        self.assertEqual(
+            [('book 1', 'author'), ('book 3', 'author')],
+            list(rows),
+        )
+
+    def test_no_duplicates(self):
+        for name in ('a', 'b'):
+            self.author.groups.add(Group.objects.create(name=name))
+        rows = export_rows(
+            User.objects.all(),
+            search='groups.name in ("a", "b")',
+            columns=['username'],
+        )
+        self.assertEqual([('author',)], list(rows))
+        # unless columns refer to multi-valued relations
+        rows = export_rows(
+            User.objects.all(),
+            search='groups.name = "a"',
+            columns=['username', 'groups.name'],
+        )
+        self.assertEqual([('author', 'a'), ('author', 'b')], sorted(rows))
+
+    def test_invalid(self):
+        with self.assertRaises(DjangoQLSchemaError):
+            export_rows(Book.objects.all(), columns=['author.unknown'])
+        with self.assertRaises(DjangoQLSchemaError):
+            export_rows(Book.objects.all(), search='unknown = 1')
+
+    def test_csv(self):
+        self.books[0].name = 'кни"га'
+        self.books[0].save()
+        lines = export_lines(
+            Book.objects.all(),
+            search='id < %s' % self.books[2].pk,
+            columns=['name', 'price'],
+        )
+        self.assertEqual(
+            ['name,price\r\n', '"кни""га",\r\n', 'book 1,1.50\r\n'],
+            list(lines),
+        )
+
+    def test_jsonl(self):
+        lines = list(export_lines(
+            Book.objects.all(),
+            search='name = "book 1"',
+            columns=['name', 'price', 'author.email'],
+            format='jsonl',
+        ))
+        self.assertEqual(1, len(lines))
+        self.assertTrue(lines[0].endswith('\n'))
+        self.assertEqual(
+            {'name': 'book 1', 'price': '1.50', 'author.email': 'a@b.c'},
+            json.loads(lines[0]),
+        )